@@ -0,0 +1,339 @@
+"""
+Streaming statistics of played games, for learning where ships are placed and which cells get hit first.
+Games flow through a pipeline of generator stages, one game at a time, so memory doesn't grow with the number of games:
+source -> read_archives(paths) yields the games of record archives (see records.py), and AnalyticsHook folds games
+    as they finish in the game loop (see events.py)
+fold_games(games, statistics) -> adds every game to a GameStatistics
+checkpoint_games(games, statistics, path, interval) -> saves the statistics every interval games
+A GameStatistics only holds numpy arrays of counts per cell and histograms per ship size, so statistics from
+several workers are merged by adding them, and they are saved with np.savez.
+"""
+import argparse
+import collections
+import contextlib
+import multiprocessing
+import os
+
+import battleship_types as b_types
+import board
+import events
+import records
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for analytics
+    np = None
+
+DEFAULT_CHECKPOINT_INTERVAL = 1000  # games between checkpoints
+DEFAULT_CHUNK_SIZE = 1000  # games per worker task when reading archives in parallel
+HEATMAPS = ("placements", "shots", "hits", "first_hits")
+
+
+def _add_counts(counts, *indexes):
+    """
+    adds 1 to counts at every index, indexes has a list per axis. Repeated indexes are each counted.
+    """
+    np.add.at(counts, tuple(np.asarray(axis_indexes, dtype=np.intp) for axis_indexes in indexes), 1)
+
+
+class GameStatistics(object):
+    """
+    Counts of every game of board_size added with add_game (games of other sizes are only counted as skipped).
+    Heatmaps are flat arrays with a count per cell (row * board_size + col), summed over both players of every game:
+    placements -> cells covered by a ship
+    shots, hits -> cells attacked, and the ones that hit a ship
+    first_hits -> the cell of each player's first hit
+    sink_turns -> (ship size, turn) the number of ships of each size sunk on each of the attacker's turns (from 1)
+    hunt_turns -> (ship size, turns) the number of ships sunk that many turns after the ship was first hit
+    Requires numpy.
+    """
+
+    def __init__(self, board_size=board.DEFAULT_BOARD_SIZE):
+        if np is None:
+            raise b_types.BattleshipError("numpy is required for analytics")
+        self.board_size = board_size
+        self.pool = b_types.get_coordinate_pool(board_size)
+        self.seen_games = 0  # games read, including skipped games, so a resumed run knows how many to skip
+        self.skipped_games = 0
+        self.games = 0
+        cell_count = board_size * board_size
+        for name in HEATMAPS:
+            setattr(self, name, np.zeros(cell_count, dtype=np.int64))
+        self.sink_turns = np.zeros((1, cell_count + 1), dtype=np.int64)
+        self.hunt_turns = np.zeros((1, cell_count + 1), dtype=np.int64)
+
+    def _fit_ship_size(self, ship_size):
+        """
+        grows the ship size axis of the histograms, so fleets with larger ships can be added.
+        """
+        missing_rows = ship_size + 1 - len(self.sink_turns)
+        if missing_rows > 0:
+            padding = ((0, missing_rows), (0, 0))
+            self.sink_turns = np.pad(self.sink_turns, padding)
+            self.hunt_turns = np.pad(self.hunt_turns, padding)
+
+    def add_game(self, game_record):
+        """
+        adds a game, anything with the attributes and iter_events() of a records.GameRecord.
+        The ships' cells are worked out from the placements, so hits can be matched to the ship they hit.
+        """
+        self.seen_games += 1
+        if game_record.board_size != self.board_size:
+            self.skipped_games += 1
+            return
+        self.games += 1
+        fleet = game_record.fleet
+        self._fit_ship_size(max(fleet.values(), default=0))
+        player_names = game_record.player_names
+        ship_cells = {player_name: {} for player_name in player_names}  # player to cell to ship
+        turns = dict.fromkeys(player_names, 0)
+        first_hit_turns = {}  # (attacker, ship) to the turn the ship was first hit
+        players_with_hits = set()
+        placement_cells, shot_cells, hit_cells, first_hit_cells = [], [], [], []
+        sink_sizes, sink_turns, hunt_turns = [], [], []
+        for event in game_record.iter_events():
+            if isinstance(event, records.Placement):
+                cells = self.pool.get_line(event.starting_coordinate, event.direction, fleet[event.ship_type])
+                for cell in cells or ():
+                    ship_cells[event.player_name][cell] = event.ship_type
+                    placement_cells.append(cell)
+                continue
+            attacker = event.player_name
+            turns[attacker] += 1
+            cell = self.pool.get_cell(event.coordinate)
+            shot_cells.append(cell)
+            if not event.attack_result.ship_hit:
+                continue
+            hit_cells.append(cell)
+            if attacker not in players_with_hits:
+                players_with_hits.add(attacker)
+                first_hit_cells.append(cell)
+            opponent = player_names[1 - player_names.index(attacker)]
+            first_hit_turns.setdefault((attacker, ship_cells[opponent].get(cell)), turns[attacker])
+            sunk_ship = event.attack_result.sunk_ship_type
+            if sunk_ship is not None:
+                sink_sizes.append(fleet[sunk_ship])
+                sink_turns.append(turns[attacker])
+                hunt_turns.append(turns[attacker] - first_hit_turns.get((attacker, sunk_ship), turns[attacker]))
+
+        # a game's cells are added with one call per array, rather than indexing numpy arrays for every event
+        _add_counts(self.placements, placement_cells)
+        _add_counts(self.shots, shot_cells)
+        _add_counts(self.hits, hit_cells)
+        _add_counts(self.first_hits, first_hit_cells)
+        _add_counts(self.sink_turns, sink_sizes, sink_turns)
+        _add_counts(self.hunt_turns, sink_sizes, hunt_turns)
+
+    def merge(self, other):
+        """
+        adds the counts of other statistics (ie. from a worker process) of the same board size to these.
+        """
+        if other.board_size != self.board_size:
+            raise b_types.BattleshipError("Can't merge statistics of different board sizes")
+        self.seen_games += other.seen_games
+        self.skipped_games += other.skipped_games
+        self.games += other.games
+        for name in HEATMAPS:
+            heatmap = getattr(self, name)
+            heatmap += getattr(other, name)
+        self._fit_ship_size(len(other.sink_turns) - 1)
+        self.sink_turns[:len(other.sink_turns)] += other.sink_turns
+        self.hunt_turns[:len(other.hunt_turns)] += other.hunt_turns
+
+    def get_heatmap(self, name):
+        """
+        returns the heatmap (one of HEATMAPS) as a board_size x board_size array of the fraction of boards,
+        ie. for placements, how often a player had a ship on each cell.
+        """
+        boards = 2 * self.games or 1
+        return (getattr(self, name) / boards).reshape((self.board_size, self.board_size))
+
+    def get_turn_percentiles(self, histograms, ship_size, percentiles=(50, 90, 99)):
+        """
+        nearest rank percentiles of sink_turns or hunt_turns for ships of ship_size, None if none were sunk.
+        """
+        if ship_size >= len(histograms):
+            return None
+        cumulative = np.cumsum(histograms[ship_size])
+        if not cumulative[-1]:
+            return None
+        return [
+            int(np.searchsorted(cumulative, max(1, -(-percentile * int(cumulative[-1]) // 100))))
+            for percentile in percentiles
+        ]
+
+    def summary(self):
+        lines = ["%s games of %sx%s (%s skipped)" % (self.games, self.board_size, self.board_size, self.skipped_games)]
+        for ship_size in range(len(self.sink_turns)):
+            sink_percentiles = self.get_turn_percentiles(self.sink_turns, ship_size)
+            if sink_percentiles is None:
+                continue
+            hunt_percentiles = self.get_turn_percentiles(self.hunt_turns, ship_size)
+            lines.append("size %s: %s sunk, sunk on turn p50 %s p90 %s p99 %s, after first hit p50 %s p90 %s p99 %s" % (
+                (ship_size, int(self.sink_turns[ship_size].sum())) + tuple(sink_percentiles + hunt_percentiles)))
+        return "\n".join(lines)
+
+    def save(self, path):
+        """
+        writes the statistics with np.savez to a temporary file then renames it over path,
+        so a checkpoint is never left half written.
+        """
+        temporary_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(temporary_path, "wb") as statistics_file:
+            np.savez(
+                statistics_file, board_size=self.board_size, seen_games=self.seen_games,
+                skipped_games=self.skipped_games, games=self.games, sink_turns=self.sink_turns,
+                hunt_turns=self.hunt_turns, **{name: getattr(self, name) for name in HEATMAPS})
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            statistics = cls(int(arrays["board_size"]))
+            for name in ("seen_games", "skipped_games", "games"):
+                setattr(statistics, name, int(arrays[name]))
+            for name in HEATMAPS + ("sink_turns", "hunt_turns"):
+                setattr(statistics, name, arrays[name].astype(np.int64))
+        return statistics
+
+
+class AnalyticsHook(events.GameHook):
+    """
+    Adds every game to statistics as soon as it finishes, by recording it with a records.GameRecorder.
+    If checkpoint_path is set, the statistics are saved there every checkpoint_interval games.
+    """
+
+    def __init__(self, statistics, checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.statistics = statistics
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.recorder = None
+
+    def on_game_start(self, game):
+        self.recorder = records.GameRecorder()
+        self.recorder.on_game_start(game)
+
+    def on_ship_placed(self, game, player, ship_type, starting_coordinate, direction, set_ship_seconds):
+        self.recorder.on_ship_placed(game, player, ship_type, starting_coordinate, direction, set_ship_seconds)
+
+    def on_attack_resolved(self, game, player, coordinate, attack_result, timing):
+        self.recorder.on_attack_resolved(game, player, coordinate, attack_result, timing)
+
+    def on_game_over(self, game, loser):
+        self.statistics.add_game(records.GameRecord(self.recorder.to_bytes()))
+        self.recorder = None
+        if self.checkpoint_path and self.statistics.seen_games % self.checkpoint_interval == 0:
+            self.statistics.save(self.checkpoint_path)
+
+
+def read_archives(paths, start=0, stop=None):
+    """
+    yields the games of the archives one after the other, from the start-th game (counting across every archive)
+    to before the stop-th. Archives are memory mapped, so only the game being read is loaded.
+    """
+    first_index = 0
+    for path in paths:
+        with records.GameArchive(path) as archive:
+            archive_start = max(0, start - first_index)
+            archive_stop = len(archive) if stop is None else min(len(archive), stop - first_index)
+            for game_index in range(archive_start, archive_stop):
+                yield archive[game_index]
+            first_index += len(archive)
+
+
+def fold_games(games, statistics):
+    """
+    adds every game to statistics, yielding each game once it's added so more stages can follow.
+    """
+    for game_record in games:
+        statistics.add_game(game_record)
+        yield game_record
+
+
+def checkpoint_games(games, statistics, path, interval=DEFAULT_CHECKPOINT_INTERVAL):
+    """
+    saves statistics to path every interval games, and once the games run out.
+    """
+    for count, game_record in enumerate(games, 1):
+        yield game_record
+        if count % interval == 0:
+            statistics.save(path)
+    statistics.save(path)
+
+
+def run_pipeline(games, statistics, checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+    """
+    folds games into statistics, checkpointing if checkpoint_path is set, and returns the statistics.
+    """
+    stream = fold_games(games, statistics)
+    if checkpoint_path:
+        stream = checkpoint_games(stream, statistics, checkpoint_path, checkpoint_interval)
+    collections.deque(stream, maxlen=0)  # runs the generators without keeping any game
+    return statistics
+
+
+def _fold_archive_chunk(args):
+    """
+    worker function for the process pool, returns the statistics of a range of games of the archives.
+    """
+    paths, board_size, start, stop = args
+    return run_pipeline(read_archives(paths, start, stop), GameStatistics(board_size))
+
+
+def analyze_archives(paths, board_size=board.DEFAULT_BOARD_SIZE, processes=1, checkpoint_path=None,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, chunk_size=DEFAULT_CHUNK_SIZE, resume=False):
+    """
+    returns the GameStatistics of every game of board_size in the archives, read by a pool of processes.
+    Each worker folds a chunk of games into its own statistics, which are merged in order, so each checkpoint
+    covers the first seen_games games. With resume, statistics are loaded from checkpoint_path (if it exists)
+    and only the games after those are read.
+    """
+    statistics = GameStatistics(board_size)
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        statistics = GameStatistics.load(checkpoint_path)
+    if processes == 1:
+        return run_pipeline(
+            read_archives(paths, statistics.seen_games), statistics, checkpoint_path, checkpoint_interval)
+
+    game_count = 0
+    for path in paths:
+        with records.GameArchive(path) as archive:
+            game_count += len(archive)
+    chunks = [
+        (paths, board_size, start, min(start + chunk_size, game_count))
+        for start in range(statistics.seen_games, game_count, chunk_size)
+    ]
+    checkpointed_games = statistics.seen_games
+    with multiprocessing.Pool(processes) if processes > 1 else contextlib.nullcontext() as pool:
+        for chunk_statistics in (pool.imap if pool else map)(_fold_archive_chunk, chunks):
+            statistics.merge(chunk_statistics)
+            if checkpoint_path and statistics.seen_games - checkpointed_games >= checkpoint_interval:
+                statistics.save(checkpoint_path)
+                checkpointed_games = statistics.seen_games
+    if checkpoint_path:
+        statistics.save(checkpoint_path)
+    return statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heatmaps and turns to sink statistics of recorded games.")
+    parser.add_argument("archives", nargs="+", help="archives written by simulation.py --record")
+    parser.add_argument("--board-size", type=int, default=board.DEFAULT_BOARD_SIZE)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--checkpoint", default=None, help="path of the .npz file the statistics are saved to")
+    parser.add_argument("--checkpoint-interval", type=int, default=DEFAULT_CHECKPOINT_INTERVAL)
+    parser.add_argument("--resume", action="store_true", help="continue from the statistics saved at --checkpoint")
+    args = parser.parse_args()
+
+    statistics = analyze_archives(
+        args.archives, args.board_size, processes=args.processes or multiprocessing.cpu_count(),
+        checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval, resume=args.resume)
+    print(statistics.summary())
+    np.set_printoptions(precision=2, suppress=True, linewidth=200)
+    for name in HEATMAPS:
+        print("%s heatmap:" % name)
+        print(statistics.get_heatmap(name))
+
+
+if __name__ == "__main__":
+    main()
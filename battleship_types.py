@@ -1,4 +1,5 @@
 
+import functools
 from enum import Enum
 from collections import namedtuple
 
@@ -9,23 +10,56 @@ class ShipType(Enum):
   Submarine = "Submarine"
   Destroyer = "Destroyer"
 
-def get_ship_sizes():
-  return {
-    ShipType.Carrier: 5, 
-    ShipType.Battleship: 4, 
-    ShipType.Cruiser: 3, 
-    ShipType.Submarine: 3,
-    ShipType.Destroyer: 2,
-  }
+SHIP_SIZES = {
+  ShipType.Carrier: 5,
+  ShipType.Battleship: 4,
+  ShipType.Cruiser: 3,
+  ShipType.Submarine: 3,
+  ShipType.Destroyer: 2,
+}
+
+SHIP_SYMBOLS = {
+  ShipType.Carrier: "C",
+  ShipType.Battleship: "B",
+  ShipType.Cruiser: "R",
+  ShipType.Submarine: "S",
+  ShipType.Destroyer: "D",
+}
+
+def get_ship_sizes():  # returns a new dict, so callers can change it without changing SHIP_SIZES
+  return dict(SHIP_SIZES)
 
 def get_ship_symbols():
-  return {
-    ShipType.Carrier: "C", 
-    ShipType.Battleship: "B", 
-    ShipType.Cruiser: "R", 
-    ShipType.Submarine: "S",
-    ShipType.Destroyer: "D",
-  }
+  return dict(SHIP_SYMBOLS)
+
+
+class FleetShip(namedtuple('FleetShip', ['ship_type', 'index'])):
+  """
+  a ship in a fleet with more than one ship of the same type, see make_fleet
+  """
+  @property
+  def name(self):
+    return "%s %s" % (self.ship_type.name, self.index + 1)
+
+def get_ship_symbol(ship):
+  """
+  symbol for either a ShipType or a FleetShip
+  """
+  return SHIP_SYMBOLS[getattr(ship, 'ship_type', ship)]
+
+def make_fleet(ship_counts):
+  """
+  given a dict of ship type to the number of ships of that type, returns a fleet (dict of ship to size).
+  types with a single ship use the ShipType as the ship, types with more use a FleetShip per ship.
+  """
+  fleet = {}
+  for ship_type, count in ship_counts.items():
+    if count == 1:
+      fleet[ship_type] = SHIP_SIZES[ship_type]
+    else:
+      for index in range(count):
+        fleet[FleetShip(ship_type, index)] = SHIP_SIZES[ship_type]
+  return fleet
 
 
 class Coordinate(namedtuple('Coordinate',['row','col'])):
@@ -48,10 +82,94 @@ ALL_DIRECTIONS = [
   Coordinate(0, -1),
 ]
 
+INTERN_LIMIT = 128 * 128  # boards with at most this many cells have their coordinates and neighbours precomputed
+
+class CoordinatePool(object):
+  """
+  flyweight Coordinates of a board size, so hot paths can pass cells (row * board_size + col) around and only
+  make a Coordinate at the edges, where a player or the board's public methods need one (see get_coordinate).
+  coordinates -> the interned Coordinate of every cell
+  neighbours -> per direction of ALL_DIRECTIONS, the cell next to every cell in that direction,
+  or None where it would be out of bounds
+  For boards with more than INTERN_LIMIT cells the tables would cost more than they save, so they are left
+  empty and the same methods compute coordinates and neighbours when they are needed.
+  """
+  def __init__(self, board_size):
+    self.board_size = board_size
+    self.cell_count = board_size * board_size
+    self.coordinates = []
+    self.neighbours = []
+    if self.cell_count <= INTERN_LIMIT:
+      self.coordinates = [Coordinate(cell // board_size, cell % board_size) for cell in range(self.cell_count)]
+      self.neighbours = [
+        [self._compute_neighbour(cell, direction) for cell in range(self.cell_count)]
+        for direction in ALL_DIRECTIONS
+      ]
+
+  def _compute_neighbour(self, cell, direction):
+    row = cell // self.board_size + direction.row
+    col = cell % self.board_size + direction.col
+    if row < 0 or col < 0 or row >= self.board_size or col >= self.board_size:
+      return None
+    return row * self.board_size + col
+
+  def get_coordinate(self, cell):
+    if self.coordinates:
+      return self.coordinates[cell]
+    return Coordinate(cell // self.board_size, cell % self.board_size)
+
+  def get_cell(self, coordinate):
+    """
+    returns the cell of the coordinate, or None if it's out of bounds.
+    """
+    row, col = coordinate
+    if row < 0 or col < 0 or row >= self.board_size or col >= self.board_size:
+      return None
+    return row * self.board_size + col
+
+  def get_neighbour(self, cell, direction_index):
+    """
+    returns the cell next to cell in the direction ALL_DIRECTIONS[direction_index], or None if it's out of bounds.
+    """
+    if self.neighbours:
+      return self.neighbours[direction_index][cell]
+    return self._compute_neighbour(cell, ALL_DIRECTIONS[direction_index])
+
+  def get_line(self, starting_coordinate, direction, length):
+    """
+    returns the cells of length steps of direction from starting_coordinate (ie. the cells of a ship),
+    or None if any of them is out of bounds. Only the two ends are checked, since a line between two cells
+    in bounds is in bounds.
+    """
+    start = self.get_cell(starting_coordinate)
+    end = self.get_cell((
+      starting_coordinate.row + direction.row * (length - 1), starting_coordinate.col + direction.col * (length - 1)))
+    if start is None or end is None:
+      return None
+    step = direction.row * self.board_size + direction.col
+    return range(start, start + step * length, step) if step else [start] * length
+
+@functools.lru_cache(maxsize=None)
+def get_coordinate_pool(board_size):
+  """
+  coordinate pools are shared by every board and player with the same board size.
+  """
+  return CoordinatePool(board_size)
+
 class BattleshipError(Exception):
   pass
 
 invalid_coordinate = BattleshipError("Invalid Coordinate")
 
+class MoveStatus(Enum):
+  """
+  result of validating a ship or attack (see validate_ship and validate_attack on the boards), instead of raising
+  invalid_coordinate. The value is a message for players.
+  """
+  OK = "OK"
+  OUT_OF_BOUNDS = "Out of bounds"
+  OVERLAPPING_SHIP = "Overlaps another ship"
+  ALREADY_ATTACKED = "Already attacked"
+
 class AttackResult(namedtuple('AttackResponse',['ship_hit','sunk_ship_type'])):
   pass
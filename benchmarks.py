@@ -0,0 +1,286 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import battleship_types as b_types
+import placements
+import players
+import simulation
+
+DEFAULT_BOARD_SIZES = [10, 50, 100]
+DEFAULT_THRESHOLD = 0.2  # fail when ops/sec drops by more than 20% from the baseline
+# every benchmark is warmed up once, then repeated at least MIN_REPEATS times and for at least MIN_SECONDS,
+# each repeat giving one ops/sec sample, so a comparison isn't decided by a single noisy run
+DEFAULT_MIN_REPEATS = 7
+DEFAULT_MIN_SECONDS = 0.2
+MAX_REPEATS = 1000
+PLAYER_NAMES = ("Player 1", "Player 2")
+
+
+class BenchmarkResult(object):
+    """
+    per operation latencies of a benchmark, in seconds, and the ops/sec of each repeat of it (see run_benchmark).
+    """
+
+    def __init__(self, name, latencies, samples):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.samples = sorted(samples)
+
+    def ops_per_second(self):
+        """
+        median ops/sec of the repeats.
+        """
+        return _median(self.samples)
+
+    def percentile(self, percentile):
+        return self.latencies[min(len(self.latencies) - 1, int(len(self.latencies) * percentile / 100))]
+
+    def to_dict(self):
+        return {
+            "ops": len(self.latencies),
+            "ops_per_second": self.ops_per_second(),
+            "best_ops_per_second": self.samples[-1],
+            "samples": self.samples,
+            "p50_us": self.percentile(50) * 1e6,
+            "p90_us": self.percentile(90) * 1e6,
+            "p99_us": self.percentile(99) * 1e6,
+        }
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def _ops_per_second(latencies):
+    total = sum(latencies)
+    return len(latencies) / total if total else 0.0
+
+
+def _timed(operation, *args):
+    start_time = time.perf_counter()
+    operation(*args)
+    return time.perf_counter() - start_time
+
+
+def _new_board(board_class, board_size):
+    return board_class(list(PLAYER_NAMES), board_size)
+
+
+def _place_fleets(board):
+    for player_name in PLAYER_NAMES:
+        placer = players.AIPlayer(player_name)
+        for ship_type in board.get_fleet():
+            placer.choose_ship(ship_type, board)
+
+
+def _random_placements(board_class, board_size):
+    """
+    returns a list of valid (coordinate, direction, ship_type, player_name) placements for a fresh board,
+    found ahead of time so only set_ship is timed.
+    """
+    fleet = _new_board(board_class, board_size).get_fleet()
+    return [
+        (starting_coordinate, direction, ship_type, player_name)
+        for player_name in PLAYER_NAMES
+        for ship_type, starting_coordinate, direction in placements.generate_fleet(fleet, board_size)
+    ]
+
+
+def bench_set_ship(board_class, board_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        fleet_placements = _random_placements(board_class, board_size)
+        board = _new_board(board_class, board_size)
+        latencies.extend(_timed(board.set_ship, *placement) for placement in fleet_placements)
+    return latencies
+
+
+def _attack_order(board_size):
+    cells = [b_types.Coordinate(row, col) for row in range(board_size) for col in range(board_size)]
+    random.shuffle(cells)
+    return cells
+
+
+def bench_set_attack(board_class, board_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        board = _new_board(board_class, board_size)
+        _place_fleets(board)
+        for coordinate in _attack_order(board_size)[:1000]:
+            latencies.append(_timed(board.set_attack, coordinate, PLAYER_NAMES[0]))
+    return latencies
+
+
+def bench_get_loser(board_class, board_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        board = _new_board(board_class, board_size)
+        _place_fleets(board)
+        for coordinate in _attack_order(board_size)[:200]:
+            board.set_attack(coordinate, PLAYER_NAMES[0])
+            latencies.append(_timed(board.get_loser))
+    return latencies
+
+
+def bench_get_matrixes(board_class, board_size, rounds):
+    """
+    times get_matrixes and reading every row, since the matrixes are rendered when read.
+    """
+    def get_and_read_matrixes(board):
+        for matrix in board.get_matrixes(PLAYER_NAMES[0]):
+            for row in matrix:
+                pass
+
+    latencies = []
+    for _ in range(rounds):
+        board = _new_board(board_class, board_size)
+        _place_fleets(board)
+        for coordinate in _attack_order(board_size)[:50]:
+            board.set_attack(coordinate, PLAYER_NAMES[0])
+            board.set_attack(coordinate, PLAYER_NAMES[1])
+        latencies.extend(_timed(get_and_read_matrixes, board) for _ in range(5))
+    return latencies
+
+
+def bench_choose_ship(board_class, board_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        board = _new_board(board_class, board_size)
+        player = players.AIPlayer(PLAYER_NAMES[0])
+        latencies.extend(_timed(player.choose_ship, ship_type, board) for ship_type in board.get_fleet())
+    return latencies
+
+
+def bench_generate_fleet(board_class, board_size, rounds):
+    fleet = _new_board(board_class, board_size).get_fleet()
+    return [_timed(placements.generate_fleet, fleet, board_size) for _ in range(100 * rounds)]
+
+
+def bench_choose_attack(board_class, board_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        board = _new_board(board_class, board_size)
+        _place_fleets(board)
+        player = players.AIPlayer(PLAYER_NAMES[0])
+        while not board.get_loser() and len(latencies) < 1000 * rounds:
+            latencies.append(_timed(player.choose_attack, board))
+    return latencies
+
+
+def bench_full_game(board_class, board_size, rounds):
+    player_factories = (players.AIPlayer, players.AIPlayer)
+    return [
+        _timed(simulation.play_game, player_factories, game_index, board_class, board_size)
+        for game_index in range(rounds)
+    ]
+
+
+BENCHMARKS = {
+    "Board.set_ship": bench_set_ship,
+    "Board.set_attack": bench_set_attack,
+    "Board.get_loser": bench_get_loser,
+    "Board.get_matrixes": bench_get_matrixes,
+    "AIPlayer.choose_ship": bench_choose_ship,
+    "placements.generate_fleet": bench_generate_fleet,
+    "AIPlayer.choose_attack": bench_choose_attack,
+    "Game": bench_full_game,
+}
+
+
+def run_benchmark(name, benchmark, board_class, board_size, rounds, seed=0,
+        min_repeats=DEFAULT_MIN_REPEATS, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    runs the benchmark once to warm up (ie. the coordinate pools and placement tables), then repeats it with rounds
+    until it ran at least min_repeats times and for at least min_seconds. returns a BenchmarkResult.
+    """
+    random.seed(seed)
+    benchmark(board_class, board_size, 1)
+    latencies = []
+    samples = []
+    start_time = time.perf_counter()
+    while len(samples) < MAX_REPEATS and (
+            len(samples) < min_repeats or time.perf_counter() - start_time < min_seconds):
+        repeat_latencies = benchmark(board_class, board_size, rounds)
+        latencies.extend(repeat_latencies)
+        samples.append(_ops_per_second(repeat_latencies))
+    return BenchmarkResult(name, latencies, samples)
+
+
+def run_benchmarks(board_sizes, rounds, board_names, seed=0,
+        min_repeats=DEFAULT_MIN_REPEATS, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    runs every benchmark for every board class and size, returns a dict of benchmark name to BenchmarkResult.
+    """
+    results = {}
+    for board_name in board_names:
+        for board_size in board_sizes:
+            for benchmark_name, benchmark in BENCHMARKS.items():
+                name = "%s[%s,%s]" % (benchmark_name, board_name, board_size)
+                results[name] = run_benchmark(name, benchmark, simulation.BOARD_CLASSES[board_name], board_size,
+                    rounds, seed, min_repeats, min_seconds)
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    returns a description of every benchmark that is slower than the baseline by more than threshold, and by more
+    than the baseline's own noise: its best repeat is more than threshold below the baseline's median repeat,
+    and also below the baseline's slowest repeat. Baselines saved without samples only have their median.
+    """
+    regressions = []
+    for name, baseline_result in baseline.items():
+        result = results.get(name)
+        if result is None:
+            continue
+        baseline_samples = baseline_result.get("samples") or [baseline_result["ops_per_second"]]
+        best = result.get("best_ops_per_second", result["ops_per_second"])
+        if best < baseline_result["ops_per_second"] * (1 - threshold) and best < min(baseline_samples):
+            regressions.append("%s: %.1f ops/sec at best (median %.1f), baseline median %.1f ops/sec" % (
+                name, best, result["ops_per_second"], baseline_result["ops_per_second"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the board, AI player and full games.")
+    parser.add_argument("--board-sizes", type=int, nargs="+", default=DEFAULT_BOARD_SIZES)
+    parser.add_argument("--boards", choices=sorted(simulation.BOARD_CLASSES), nargs="+", default=["board"])
+    parser.add_argument("--rounds", type=int, default=5, help="rounds of each benchmark per repeat")
+    parser.add_argument("--min-repeats", type=int, default=DEFAULT_MIN_REPEATS)
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+        help="minimum time to repeat each benchmark for")
+    parser.add_argument("--save", help="path to save the results to as a JSON baseline")
+    parser.add_argument("--compare", help="path of a JSON baseline to compare the results against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    results = {
+        name: result.to_dict()
+        for name, result in run_benchmarks(
+            args.board_sizes, args.rounds, args.boards, min_repeats=args.min_repeats, min_seconds=args.min_seconds
+        ).items()
+    }
+    for name, result in results.items():
+        print("%-45s %12.1f ops/sec (best %12.1f, %4s repeats)  p50 %9.2fus  p90 %9.2fus  p99 %9.2fus" % (
+            name, result["ops_per_second"], result["best_ops_per_second"], len(result["samples"]),
+            result["p50_us"], result["p90_us"], result["p99_us"]))
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import battleship_types as b_types
+import board
+
+
+class BitBoard(object):
+    """
+    BitBoard is a drop in replacement for board.Board, with the same public methods:
+    get_board_size(), get_fleet(), get_ship_size(), get_loser(), get_matrixes(), set_ship(), set_attack(),
+    set_attacks(), validate_ship(), validate_attack(), track_changes(), pop_changes(), fork(), track_undo() and undo().
+    Instead of dicts and sets of coordinates, each player's state is stored as integer bitmasks,
+    where the bit for a coordinate is row * board_size + col:
+    ship_masks -> per player, dict of ship type to the mask of the cells that ship covers
+    fleet_masks -> per player, the union of all of that player's ship masks
+    hits, misses -> per player, masks of the attacks made by that player
+    remaining -> per player, the number of ship cells that haven't been hit yet, so get_loser() is constant time
+    Players are stored by index (0 or 1), so the opponent of a player is always 1 - index.
+    Unlike Board, each mask has a bit for every cell, so memory scales with the size of the board.
+    Masks are immutable integers, and set_ship replaces a player's dict of ship masks rather than changing it,
+    so fork() shares the ship masks and only copies the lists and the dicts of ship health, in O(number of ships).
+    """
+    __slots__ = (
+        'board_size', 'fleet', 'pool', 'player_names', 'player_indexes', 'ship_masks', 'fleet_masks',
+        'hits', 'misses', 'ships_health_count', 'remaining', 'changed_cells', 'undo_log',
+    )
+
+    def __init__(self, player_names, board_size=board.DEFAULT_BOARD_SIZE, fleet=None):
+        if len(player_names) != 2:
+            raise b_types.BattleshipError("Invalid number of players")
+        if board_size < 1 or board_size > board.MAX_BOARD_SIZE:
+            raise b_types.BattleshipError("Invalid board size")
+        self.board_size = board_size
+        self.fleet = dict(fleet) if fleet else b_types.get_ship_sizes()
+        self.pool = b_types.get_coordinate_pool(board_size)
+        self.player_names = list(player_names)
+        self.player_indexes = {player_name: index for index, player_name in enumerate(self.player_names)}
+        self.ship_masks = [{}, {}]
+        self.fleet_masks = [0, 0]
+        self.hits = [0, 0]
+        self.misses = [0, 0]
+        self.ships_health_count = [dict(self.fleet), dict(self.fleet)]
+        self.remaining = [sum(health.values()) for health in self.ships_health_count]
+        self.changed_cells = [None, None]  # per player, list of changed cells once track_changes is called
+        self.undo_log = None  # (player index, cell, attack bit, ship type or None), once track_undo is called
+
+    def _record_change(self, player_index, plane, cell, symbol):
+        if self.changed_cells[player_index] is not None:
+            self.changed_cells[player_index].append((plane, cell, symbol))
+
+    def _get_ship_mask(self, ship_cells):
+        """
+        returns the mask of the cells the ship would cover, or None if any of them is out of bounds.
+        """
+        if ship_cells is None:
+            return None
+        ship_mask = 0
+        for cell in ship_cells:
+            ship_mask |= 1 << cell
+        return ship_mask
+
+    def get_board_size(self):
+        """
+        returns the length of the board.
+        """
+        return self.board_size
+
+    def get_fleet(self):
+        """
+        returns the dict of ship to ship size that each player sets.
+        """
+        return self.fleet
+
+    def get_ship_size(self, ship_type):
+        return self.fleet[ship_type]
+
+    def get_loser(self):
+        for index, remaining in enumerate(self.remaining):
+            if remaining <= 0:
+                return self.player_names[index]
+        return None
+
+    def validate_ship(self, starting_coordinate, direction, ship_type, player_name):
+        """
+        returns MoveStatus.OK if set_ship would set the ship, otherwise the reason it wouldn't.
+        """
+        ship_mask = self._get_ship_mask(self.pool.get_line(starting_coordinate, direction, self.fleet[ship_type]))
+        if ship_mask is None:
+            return b_types.MoveStatus.OUT_OF_BOUNDS
+        if ship_mask & self.fleet_masks[self.player_indexes[player_name]]:
+            return b_types.MoveStatus.OVERLAPPING_SHIP
+        return b_types.MoveStatus.OK
+
+    def set_ship(self,
+        starting_coordinate, direction, ship_type, player_name):
+        """
+        given a starting coordinate,
+        a direction coordinate, a ship_type enum and the player_name, sets the ship on the board.
+        """
+        player_index = self.player_indexes[player_name]
+        # must validate all coordinates before setting ship
+        ship_cells = self.pool.get_line(starting_coordinate, direction, self.fleet[ship_type])
+        ship_mask = self._get_ship_mask(ship_cells)
+        if ship_mask is None or ship_mask & self.fleet_masks[player_index]:
+            raise b_types.invalid_coordinate
+
+        ship_masks = dict(self.ship_masks[player_index])  # may be shared with a fork, see fork
+        ship_masks[ship_type] = ship_mask
+        self.ship_masks[player_index] = ship_masks
+        self.fleet_masks[player_index] |= ship_mask
+        if self.changed_cells[player_index] is not None:
+            for cell in ship_cells:
+                self._record_change(player_index, board.OCEAN_PLANE, cell, b_types.get_ship_symbol(ship_type))
+
+    def _validate_attack_cell(self, cell, player_index):
+        if cell is None:
+            return b_types.MoveStatus.OUT_OF_BOUNDS
+        if (1 << cell) & (self.hits[player_index] | self.misses[player_index]):
+            return b_types.MoveStatus.ALREADY_ATTACKED
+        return b_types.MoveStatus.OK
+
+    def validate_attack(self, coordinate, player_name):
+        """
+        returns MoveStatus.OK if set_attack would set the attack, otherwise the reason it wouldn't.
+        """
+        return self._validate_attack_cell(self.pool.get_cell(coordinate), self.player_indexes[player_name])
+
+    def _apply_attack(self, cell, player_index):
+        attack_bit = 1 << cell
+        opponent_index = 1 - player_index
+        if not attack_bit & self.fleet_masks[opponent_index]:
+            self.misses[player_index] |= attack_bit
+            if self.undo_log is not None:
+                self.undo_log.append((player_index, cell, attack_bit, None))
+            self._record_change(player_index, board.ATTACKS_PLANE, cell, 'M')
+            self._record_change(opponent_index, board.OCEAN_PLANE, cell, 'M')
+            return b_types.AttackResult(False, None)
+
+        self.hits[player_index] |= attack_bit
+        self._record_change(player_index, board.ATTACKS_PLANE, cell, 'H')
+        self._record_change(opponent_index, board.OCEAN_PLANE, cell, 'H')
+        self.remaining[opponent_index] -= 1
+        for ship_type, ship_mask in self.ship_masks[opponent_index].items():
+            if attack_bit & ship_mask:
+                opponents_ships_health_count = self.ships_health_count[opponent_index]
+                opponents_ships_health_count[ship_type] -= 1
+                if self.undo_log is not None:
+                    self.undo_log.append((player_index, cell, attack_bit, ship_type))
+                if opponents_ships_health_count[ship_type] <= 0:
+                    return b_types.AttackResult(True, ship_type)
+                return b_types.AttackResult(True, None)
+        return b_types.AttackResult(True, None)  # will never reach return, the fleet mask is the union of ship masks
+
+    def set_attack(self, coordinate, player_name):
+        """
+        sets an attack on the board for the player.
+        """
+        player_index = self.player_indexes[player_name]
+        cell = self.pool.get_cell(coordinate)
+        if self._validate_attack_cell(cell, player_index) is not b_types.MoveStatus.OK:
+            raise b_types.invalid_coordinate
+        return self._apply_attack(cell, player_index)
+
+    def set_attacks(self, player_name, coordinates):
+        """
+        sets every attack in coordinates for the player, in order, without raising, see board.Board.set_attacks.
+        """
+        player_index = self.player_indexes[player_name]
+        results = []
+        for coordinate in coordinates:
+            cell = self.pool.get_cell(coordinate)
+            status = self._validate_attack_cell(cell, player_index)
+            if status is b_types.MoveStatus.OK:
+                results.append((status, self._apply_attack(cell, player_index)))
+            else:
+                results.append((status, None))
+        return results
+
+    def get_matrixes(self, player_name):
+        """
+        H denotes Hit in attack board
+        M denotes Miss in attack board
+        H denotes Hit in ocean (ship) board
+        ship type is denoted by letter according to get_ship_symbols
+        both are returned as a board.BoardView, so cells are only rendered when a row is read.
+        """
+        player_index = self.player_indexes[player_name]
+        opponent_index = 1 - player_index
+
+        def get_attack_symbol(cell):
+            bit = 1 << cell
+            if bit & self.hits[player_index]:
+                return 'H'
+            return 'M' if bit & self.misses[player_index] else ' '
+
+        def get_ship_symbol(cell):
+            bit = 1 << cell
+            if bit & self.hits[opponent_index]:
+                return 'H'
+            elif bit & self.misses[opponent_index]:
+                return 'M'
+            for ship_type, ship_mask in self.ship_masks[player_index].items():
+                if bit & ship_mask:
+                    return b_types.get_ship_symbol(ship_type)
+            return ' '
+
+        return board.BoardView(self.board_size, get_attack_symbol), board.BoardView(self.board_size, get_ship_symbol)
+
+    def track_changes(self, player_name):
+        """
+        starts recording the cells that change in the player's matrixes, see board.Board.pop_changes.
+        """
+        player_index = self.player_indexes[player_name]
+        if self.changed_cells[player_index] is None:
+            self.changed_cells[player_index] = []
+
+    def pop_changes(self, player_name):
+        """
+        returns the (plane, coordinate, symbol) of every cell changed since the last call.
+        """
+        player_index = self.player_indexes[player_name]
+        changes = self.changed_cells[player_index] or []
+        if self.changed_cells[player_index] is not None:
+            self.changed_cells[player_index] = []
+        return [(plane, self.pool.get_coordinate(cell), symbol) for plane, cell, symbol in changes]
+
+    def track_undo(self):
+        """
+        starts recording every set_attack so they can be undone, see board.Board.track_undo.
+        """
+        if self.undo_log is None:
+            self.undo_log = []
+
+    def fork(self):
+        """
+        returns a copy of the board that can be changed without changing this board, see board.Board.fork.
+        """
+        forked_board = BitBoard.__new__(BitBoard)
+        forked_board.board_size = self.board_size
+        forked_board.fleet = self.fleet
+        forked_board.pool = self.pool
+        forked_board.player_names = self.player_names
+        forked_board.player_indexes = self.player_indexes
+        forked_board.ship_masks = list(self.ship_masks)
+        forked_board.fleet_masks = list(self.fleet_masks)
+        forked_board.hits = list(self.hits)
+        forked_board.misses = list(self.misses)
+        forked_board.ships_health_count = [dict(health) for health in self.ships_health_count]
+        forked_board.remaining = list(self.remaining)
+        forked_board.changed_cells = [None, None]
+        forked_board.undo_log = []
+        return forked_board
+
+    def undo(self):
+        """
+        rolls back the last set_attack that hasn't been undone, see board.Board.undo.
+        """
+        if not self.undo_log:
+            raise b_types.BattleshipError("There are no attacks to undo")
+        player_index, cell, attack_bit, ship_type = self.undo_log.pop()
+        opponent_index = 1 - player_index
+        self._record_change(player_index, board.ATTACKS_PLANE, cell, ' ')
+        if ship_type is None:
+            self.misses[player_index] &= ~attack_bit
+            self._record_change(opponent_index, board.OCEAN_PLANE, cell, ' ')
+            return
+        self.hits[player_index] &= ~attack_bit
+        self.remaining[opponent_index] += 1
+        self.ships_health_count[opponent_index][ship_type] += 1
+        self._record_change(opponent_index, board.OCEAN_PLANE, cell, b_types.get_ship_symbol(ship_type))
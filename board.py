@@ -1,40 +1,125 @@
 import battleship_types as b_types
 
+DEFAULT_BOARD_SIZE = 10
+MAX_BOARD_SIZE = 1000
+ATTACKS_PLANE = 0  # the board of a player's attacks, the first matrix from get_matrixes
+OCEAN_PLANE = 1  # the board of a player's ships, the second matrix from get_matrixes
+
+
+class BoardView(object):
+    """
+    read only view of a board_size x board_size matrix, that renders a row only when it's read.
+    get_symbol is called with the cell (row * board_size + col) of each cell in the row. Supports len(), indexing a row
+    (which returns a list of symbols), iterating over the rows and comparing, like the list of lists it replaces.
+    """
+
+    def __init__(self, board_size, get_symbol):
+        self.board_size = board_size
+        self.get_symbol = get_symbol
+
+    def __len__(self):
+        return self.board_size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.board_size
+        if row < 0 or row >= self.board_size:
+            raise IndexError("row out of range")
+        return [self.get_symbol(cell) for cell in range(row * self.board_size, (row + 1) * self.board_size)]
+
+    def __iter__(self):
+        for row in range(self.board_size):
+            yield self[row]
+
+    def __eq__(self, other):
+        return self.to_list() == [list(row) for row in other]
+
+    def to_list(self):
+        return list(self)
+
+
 class Board(object):
     """
     Board is the class used for storing data for the state of the battleship board.
     There are these public methods, everything else is private:
     get_board_size() -> returns the board's length
+    get_fleet() -> returns the dict of ship to ship size that each player sets
+    get_ship_size(ship_type) -> returns the size of a ship in the fleet
     get_loser() -> returns a loser of the game, otherwise returns None
     get_matrixes() -> returns the matrix for the given player, as a board
     set_ship(starting_coordinate, direction, ship_type, player_name) -> given a starting coordinate,
     a direction coordinate, a ship_type enum and the player_name, sets the ship on the board.
     set_attack(coordinate, player_name) -> sets an attack on the board for the player.
-    If there are validity errors in set_ship and set_attack, an invalid_coordinate error is returned
+    set_attacks(player_name, coordinates) -> sets a sequence of attacks, returns a (MoveStatus, AttackResult) per attack
+    validate_ship(...) and validate_attack(...) -> return the MoveStatus of a move, without changing the board
+    track_changes(player_name) -> starts recording the cells that change in the player's matrixes
+    pop_changes(player_name) -> returns the list of (plane, coordinate, symbol) changed since the last call
+    fork() -> returns a copy of the board without copying its containers, for players that search ahead
+    track_undo() -> starts recording every set_attack, so they can be undone. Forks record from the start
+    undo() -> rolls back the last recorded set_attack, including the health of the ship it hit
+    If there are validity errors in set_ship and set_attack, an invalid_coordinate error is raised
+    The board size and fleet can be configured, the default is the classic 10x10 board with 5 ships (see get_ship_sizes).
+    Only ships and attacks are stored, so memory scales with those rather than the size of the board.
+    They are stored by cell (row * board_size + col, see battleship_types.CoordinatePool) rather than by Coordinate,
+    Coordinates are only made for the methods that return them.
+    The symbols each player sees are kept up to date by set_ship and set_attack, so get_matrixes doesn't replay the game.
+    A fork shares each player's containers with the board it was forked from, whichever board writes to one first
+    copies it (copy on write), so a fork only costs the containers that are changed afterwards.
     """
 
-    def __init__(self, player_names):
-        self.board_size = 10
-        self.attacks = {}  # player_name to set of coordinates
-        self.ships = {}  # player_name to dict of coordinates and ship types
+    def __init__(self, player_names, board_size=DEFAULT_BOARD_SIZE, fleet=None):
+        if board_size < 1 or board_size > MAX_BOARD_SIZE:
+            raise b_types.BattleshipError("Invalid board size")
+        self.board_size = board_size
+        self.fleet = dict(fleet) if fleet else b_types.get_ship_sizes()  # ship to ship size
+        self.pool = b_types.get_coordinate_pool(board_size)
+        self.attacks = {}  # player_name to set of cells
+        self.ships = {}  # player_name to dict of cells and ship types
         self.ships_health_count = {}  # player_name to dict of ship types and type of ships
+        self.symbols = {}  # player_name to a dict of cell to symbol for each plane, see get_matrixes
+        self.changed_cells = {}  # player_name to list of changed cells, only for players with track_changes
+        self.shared = set()  # (attribute, player_name) of the containers shared with a fork, see _get_writable
+        self.undo_log = None  # (player_name, cell, ship_type or None) of every set_attack once track_undo is called
         if len(player_names) != 2:
             raise b_types.BattleshipError("Invalid number of players")
 
         for player_name in player_names:
-            self.attacks[player_name] = set()  # set of coordinates
-            self.ships[player_name] = {}  # coordinates to ship types
+            self.attacks[player_name] = set()  # set of cells
+            self.ships[player_name] = {}  # cells to ship types
             self.ships_health_count[player_name] = self._init_ships_health_count(player_name)
-    
-    def _get_opponents_attacks(self, player_name):
-        for opponent_name, attacks in self.attacks.items():
+            self.symbols[player_name] = ({}, {})
+
+    def _get_opponent_name(self, player_name):
+        for opponent_name in self.attacks.keys():
             if opponent_name != player_name:
-                return attacks
+                return opponent_name
+
+    def _get_writable(self, attribute, player_name):
+        """
+        returns the player's container in the attribute (ie. "attacks"), copying it first if it's shared with a fork.
+        """
+        containers = getattr(self, attribute)
+        if (attribute, player_name) in self.shared:
+            self.shared.discard((attribute, player_name))
+            container = containers[player_name]
+            if isinstance(container, tuple):  # the symbols of each plane
+                containers[player_name] = tuple(dict(plane_symbols) for plane_symbols in container)
+            else:
+                containers[player_name] = container.copy()
+        return containers[player_name]
+
+    def _set_symbol(self, player_name, plane, cell, symbol):
+        plane_symbols = self._get_writable("symbols", player_name)[plane]
+        if symbol == ' ':
+            plane_symbols.pop(cell, None)
+        else:
+            plane_symbols[cell] = symbol
+        changed_cells = self.changed_cells.get(player_name)
+        if changed_cells is not None:
+            changed_cells.append((plane, cell, symbol))
 
     def _decrement_opponents_ships(self, player_name, ship_type):
-        for opponent_name, ships_health_count in self.ships_health_count.items():
-            if opponent_name != player_name:
-                ships_health_count[ship_type] -= 1
+        self._get_writable("ships_health_count", self._get_opponent_name(player_name))[ship_type] -= 1
 
     def _get_opponents_ships(self, player_name):
         for opponent_name, ships in self.ships.items():
@@ -47,11 +132,7 @@ class Board(object):
                 return ships_health_count
 
     def _init_ships_health_count(self, player_name):
-        return b_types.get_ship_sizes() 
-
-    def _validate_coordinate_within_bounds(self, coordinate):
-        if not coordinate.within_bounds(self.board_size):
-            raise b_types.invalid_coordinate
+        return dict(self.fleet)
 
     def get_board_size(self):
         """
@@ -59,6 +140,15 @@ class Board(object):
         """
         return self.board_size
 
+    def get_fleet(self):
+        """
+        returns the dict of ship to ship size that each player sets.
+        """
+        return self.fleet
+
+    def get_ship_size(self, ship_type):
+        return self.fleet[ship_type]
+
     def get_loser(self):
         for player_name, ships_health in self.ships_health_count.items():
             total_count = 0
@@ -68,6 +158,22 @@ class Board(object):
                 return player_name
         return None 
 
+    def _validate_ship_cells(self, ship_cells, player_name):
+        if ship_cells is None:
+            return b_types.MoveStatus.OUT_OF_BOUNDS
+        ships = self.ships[player_name]
+        for cell in ship_cells:
+            if cell in ships:
+                return b_types.MoveStatus.OVERLAPPING_SHIP
+        return b_types.MoveStatus.OK
+
+    def validate_ship(self, starting_coordinate, direction, ship_type, player_name):
+        """
+        returns MoveStatus.OK if set_ship would set the ship, otherwise the reason it wouldn't.
+        """
+        ship_cells = self.pool.get_line(starting_coordinate, direction, self.fleet[ship_type])
+        return self._validate_ship_cells(ship_cells, player_name)
+
     def set_ship(self, 
         starting_coordinate, direction, ship_type, player_name):
         """
@@ -75,28 +181,39 @@ class Board(object):
         a direction coordinate, a ship_type enum and the player_name, sets the ship on the board.
         """
         # must validate all coordinates before setting ship
-        for i in range(b_types.get_ship_sizes().get(ship_type)):
-            current_coordinate = starting_coordinate + direction * i
-            self._validate_coordinate_within_bounds(current_coordinate)
-            if self.ships[player_name].get(current_coordinate):
-                raise b_types.invalid_coordinate
+        ship_cells = self.pool.get_line(starting_coordinate, direction, self.fleet[ship_type])
+        if self._validate_ship_cells(ship_cells, player_name) is not b_types.MoveStatus.OK:
+            raise b_types.invalid_coordinate
 
+        ship_symbol = b_types.get_ship_symbol(ship_type)
+        ships = self._get_writable("ships", player_name)
+        for cell in ship_cells:
+            ships[cell] = ship_type
+            self._set_symbol(player_name, OCEAN_PLANE, cell, ship_symbol)
 
-        for i in range(b_types.get_ship_sizes().get(ship_type)):
-            current_coordinate = starting_coordinate + direction * i
-            self.ships[player_name][current_coordinate] = ship_type
+    def _validate_attack_cell(self, cell, player_name):
+        if cell is None:
+            return b_types.MoveStatus.OUT_OF_BOUNDS
+        if cell in self.attacks[player_name]:
+            return b_types.MoveStatus.ALREADY_ATTACKED
+        return b_types.MoveStatus.OK
 
-    def set_attack(self, coordinate, player_name):
+    def validate_attack(self, coordinate, player_name):
         """
-        sets an attack on the board for the player.
+        returns MoveStatus.OK if set_attack would set the attack, otherwise the reason it wouldn't.
         """
-        self._validate_coordinate_within_bounds(coordinate)
-        if coordinate in self.attacks[player_name]:
-            raise b_types.invalid_coordinate
-        self.attacks[player_name].add(coordinate)
+        return self._validate_attack_cell(self.pool.get_cell(coordinate), player_name)
+
+    def _apply_attack(self, cell, player_name):
+        self._get_writable("attacks", player_name).add(cell)
         opponent_ships = self._get_opponents_ships(player_name)
-        if opponent_ships.get(coordinate):
-            ship_type = opponent_ships[coordinate]
+        ship_type = opponent_ships.get(cell)
+        if self.undo_log is not None:
+            self.undo_log.append((player_name, cell, ship_type))
+        symbol = 'H' if ship_type is not None else 'M'
+        self._set_symbol(player_name, ATTACKS_PLANE, cell, symbol)
+        self._set_symbol(self._get_opponent_name(player_name), OCEAN_PLANE, cell, symbol)
+        if ship_type is not None:
             self._decrement_opponents_ships(player_name, ship_type)
             if self._get_opponents_ships_health_count(player_name)[ship_type] <= 0:
                 return b_types.AttackResult(True, ship_type)
@@ -104,37 +221,99 @@ class Board(object):
                 return b_types.AttackResult(True, None)
         return b_types.AttackResult(False, None)
 
-    def _create_empty_matrix(self):
-        return [[' ' for i in range(self.board_size)] for j in range(self.board_size)]
+    def set_attack(self, coordinate, player_name):
+        """
+        sets an attack on the board for the player.
+        """
+        cell = self.pool.get_cell(coordinate)
+        if self._validate_attack_cell(cell, player_name) is not b_types.MoveStatus.OK:
+            raise b_types.invalid_coordinate
+        return self._apply_attack(cell, player_name)
+
+    def set_attacks(self, player_name, coordinates):
+        """
+        sets every attack in coordinates for the player, in order, without raising.
+        returns a list of (MoveStatus, AttackResult) for each attack, where the AttackResult is None for invalid
+        attacks, which are skipped.
+        """
+        results = []
+        for coordinate in coordinates:
+            cell = self.pool.get_cell(coordinate)
+            status = self._validate_attack_cell(cell, player_name)
+            if status is b_types.MoveStatus.OK:
+                results.append((status, self._apply_attack(cell, player_name)))
+            else:
+                results.append((status, None))
+        return results
 
-    def get_matrixes(self, player_name):  
+    def get_matrixes(self, player_name):
         """
         H denotes Hit in attack board
         M denotes Miss in attack board
         H denotes Hit in ocean (ship) board
         ship type is denoted by letter according to get_ship_symbols
+        both are returned as a BoardView of the player's symbols, so cells are only rendered when a row is read.
+        """
+        return tuple(
+            BoardView(self.board_size, lambda cell, plane_symbols=plane_symbols: plane_symbols.get(cell, ' '))
+            for plane_symbols in self.symbols[player_name]
+        )
 
+    def track_changes(self, player_name):
+        """
+        starts recording the cells that change in the player's matrixes, for renderers that only redraw those cells.
         """
-        
-        opponents_ships = self._get_opponents_ships(player_name)
+        self.changed_cells.setdefault(player_name, [])
 
-        attacks_matrix = self._create_empty_matrix()
-        for attack_coordinate in self.attacks[player_name]:
-            if opponents_ships.get(attack_coordinate):
-                attacks_matrix[attack_coordinate.row][attack_coordinate.col] = 'H'
-            else:
-                attacks_matrix[attack_coordinate.row][attack_coordinate.col] = 'M'
+    def pop_changes(self, player_name):
+        """
+        returns the (plane, coordinate, symbol) of every cell changed since the last call, where plane is
+        ATTACKS_PLANE or OCEAN_PLANE. Only cells changed after track_changes was called are returned.
+        """
+        changes = self.changed_cells.get(player_name) or []
+        if player_name in self.changed_cells:
+            self.changed_cells[player_name] = []
+        return [(plane, self.pool.get_coordinate(cell), symbol) for plane, cell, symbol in changes]
 
-        opponents_attacks = self._get_opponents_attacks(player_name)
-        ships_matrix = self._create_empty_matrix()
-        
-        for ship_coordinate, ship_type in self.ships[player_name].items():
-            ships_matrix[ship_coordinate.row][ship_coordinate.col] = b_types.get_ship_symbols().get(ship_type)
+    def track_undo(self):
+        """
+        starts recording every set_attack, for players that search ahead and undo their attacks (see undo).
+        """
+        if self.undo_log is None:
+            self.undo_log = []
 
-        for opponent_attack_coordinate in opponents_attacks:
-            if ships_matrix[opponent_attack_coordinate.row][opponent_attack_coordinate.col] != ' ':
-                ships_matrix[opponent_attack_coordinate.row][opponent_attack_coordinate.col] = 'H'
-            else:
-                ships_matrix[opponent_attack_coordinate.row][opponent_attack_coordinate.col] = 'M'
+    def fork(self):
+        """
+        returns a copy of the board that can be changed without changing this board, without copying its containers:
+        only the dicts of each player's containers are copied, and every container is then shared by both boards,
+        so whichever board first writes to one copies it then (see _get_writable). The fork records its attacks
+        for undo from the start, and doesn't track changes.
+        """
+        forked_board = Board.__new__(Board)
+        forked_board.board_size = self.board_size
+        forked_board.fleet = self.fleet
+        forked_board.pool = self.pool
+        forked_board.changed_cells = {}
+        forked_board.undo_log = []
+        for attribute in ("attacks", "ships", "ships_health_count", "symbols"):
+            setattr(forked_board, attribute, dict(getattr(self, attribute)))
+            self.shared.update((attribute, player_name) for player_name in self.attacks)
+        forked_board.shared = set(self.shared)  # every container is now shared by both boards
+        return forked_board
 
-        return attacks_matrix, ships_matrix
+    def undo(self):
+        """
+        rolls back the last set_attack that hasn't been undone, so the board is exactly as it was before it.
+        Only attacks set after track_undo (or on a fork) are recorded.
+        """
+        if not self.undo_log:
+            raise b_types.BattleshipError("There are no attacks to undo")
+        player_name, cell, ship_type = self.undo_log.pop()
+        opponent_name = self._get_opponent_name(player_name)
+        self._get_writable("attacks", player_name).discard(cell)
+        self._set_symbol(player_name, ATTACKS_PLANE, cell, ' ')
+        if ship_type is not None:
+            self._get_writable("ships_health_count", opponent_name)[ship_type] += 1
+            self._set_symbol(opponent_name, OCEAN_PLANE, cell, b_types.get_ship_symbol(ship_type))
+        else:
+            self._set_symbol(opponent_name, OCEAN_PLANE, cell, ' ')
@@ -0,0 +1,95 @@
+"""
+Works out which hits belong to ships that have been sunk, when ships may be next to each other.
+Hits are split into clusters of connected hits (a ship's cells are always connected, so every ship is in one cluster).
+For each cluster with a sink in it, every way of placing the sunk ships is enumerated: each sunk ship is a line of its
+size through the attack that sunk it, only on cells of the cluster that were hit before that attack, and not
+overlapping the other sunk ships. A hit is resolved if it is covered by a sunk ship in every one of those placements,
+every other hit could belong to a ship that is still afloat. Cells are row * board_size + col, sets of cells are
+bitmasks (see placements.PlacementTable), and the solution of each cluster is memoized, so a cluster that comes up
+again (in a later turn or another game) is a lookup.
+"""
+import functools
+
+import placements
+
+CLUSTER_CACHE_SIZE = 4096
+
+
+def _get_neighbours(cell, board_size):
+    row, col = cell // board_size, cell % board_size
+    if row > 0:
+        yield cell - board_size
+    if row < board_size - 1:
+        yield cell + board_size
+    if col > 0:
+        yield cell - 1
+    if col < board_size - 1:
+        yield cell + 1
+
+
+def get_cluster(hits, cell, board_size):
+    """
+    returns the cluster of hits connected (sharing an edge) to the hit cell, as a list of cells.
+    """
+    cluster = [cell]
+    visited = {cell}
+    for cluster_cell in cluster:  # the list grows as it is iterated, like a queue
+        for neighbour in _get_neighbours(cluster_cell, board_size):
+            if neighbour in hits and neighbour not in visited:
+                visited.add(neighbour)
+                cluster.append(neighbour)
+    return cluster
+
+
+@functools.lru_cache(maxsize=CLUSTER_CACHE_SIZE)
+def solve_cluster(board_size, ranked_cells, sinks):
+    """
+    ranked_cells is a sorted tuple of (cell, rank) for the hits of a cluster, where rank is the order the cells were hit
+    in, sinks a sorted tuple of (cell, ship size) for the attacks in the cluster that sunk a ship.
+    returns the mask of the cells covered by a sunk ship in every consistent placement of the sunk ships,
+    or None if there isn't a consistent placement (ie. the hits and sinks don't come from the same game).
+    """
+    table = placements.get_placement_table(board_size)
+    ranks = dict(ranked_cells)
+    candidates = []  # for each sunk ship, the masks of the placements it could have
+    for sink_cell, ship_size in sinks:
+        earlier_mask = sum(1 << cell for cell, rank in ranked_cells if rank <= ranks[sink_cell])
+        candidates.append([
+            ship_mask for ship_mask in (
+                table.get_mask(ship_size, i) for i in table.get_placements_covering(ship_size, sink_cell))
+            if not ship_mask & ~earlier_mask
+        ])
+    candidates.sort(key=len)  # ships with the fewest placements first, so dead ends are found early
+
+    resolved = [None]  # the intersection of the covered masks found so far, None until one is found
+
+    def place_ships(ship_index, covered_mask):
+        if resolved[0] == 0:
+            return  # nothing can be resolved, no need to keep looking
+        if ship_index == len(candidates):
+            resolved[0] = covered_mask if resolved[0] is None else resolved[0] & covered_mask
+            return
+        for ship_mask in candidates[ship_index]:
+            if not ship_mask & covered_mask:
+                place_ships(ship_index + 1, covered_mask | ship_mask)
+
+    place_ships(0, 0)
+    return resolved[0]
+
+
+def resolve_cluster(hit_ranks, sinks, cell, board_size):
+    """
+    hit_ranks is a dict of every hit cell to the order it was hit in, sinks a dict of the cell of every sink to
+    the size of the ship sunk. Only the cluster of a new sink needs to be solved again, since the sunk ships of
+    the other clusters can't be on hits made after they sunk.
+    returns the mask of the cells in the cluster of the hit cell, and the mask of the ones that are resolved.
+    """
+    cluster = get_cluster(hit_ranks, cell, board_size)
+    cluster_mask = sum(1 << cluster_cell for cluster_cell in cluster)
+    cluster_sinks = tuple(sorted(
+        (cluster_cell, sinks[cluster_cell]) for cluster_cell in cluster if cluster_cell in sinks))
+    # only the order of the cluster's hits matters, so ranks start from 0 and memoized solutions are reused more
+    ordered_cells = sorted(cluster, key=hit_ranks.get)
+    ranked_cells = tuple(sorted((cluster_cell, rank) for rank, cluster_cell in enumerate(ordered_cells)))
+    resolved_mask = solve_cluster(board_size, ranked_cells, cluster_sinks) if cluster_sinks else 0
+    return cluster_mask, resolved_mask or 0
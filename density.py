@@ -0,0 +1,136 @@
+import random
+from collections import Counter
+
+import battleship_types as b_types
+import players
+import transposition
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the density player
+    np = None
+
+# the best cells are only cached for positions that come up again: past the first attacks of a game the same
+# position is almost never seen twice, and on large boards the tied best cells are large to store for few hits
+MAX_CACHED_ATTACKS = 12
+MAX_CACHED_BOARD_SIZE = 32
+
+
+def _get_cell_dtype(board_size):
+    """
+    smallest unsigned dtype that holds every cell of the board, for packing cells into the transposition cache.
+    """
+    return np.uint16 if board_size * board_size <= 1 << 16 else np.uint32
+
+
+def _window_sums(cells, window_size):
+    """
+    sums of every window of window_size consecutive cells along the rows of the 2d cells array,
+    computed for the whole board at once with a cumulative sum.
+    returns an array with board_size - window_size + 1 columns, where column i is the sum of columns i to i + window_size - 1
+    """
+    cumulative = np.zeros((cells.shape[0], cells.shape[1] + 1), dtype=np.int64)
+    np.cumsum(cells, axis=1, out=cumulative[:, 1:])
+    return cumulative[:, window_size:] - cumulative[:, :-window_size]
+
+
+def _row_placement_density(blocked, ship_size):
+    """
+    for every cell, counts the horizontal placements of a ship of ship_size covering it that don't overlap a blocked cell.
+    """
+    board_size = blocked.shape[1]
+    if ship_size > board_size:
+        return np.zeros(blocked.shape, dtype=np.int64)
+    valid_placements = (_window_sums(blocked, ship_size) == 0).astype(np.int64)
+    # pad so that every cell has a full window of placement starts that could cover it
+    padded = np.zeros((blocked.shape[0], board_size + ship_size - 1), dtype=np.int64)
+    padded[:, ship_size - 1:ship_size - 1 + valid_placements.shape[1]] = valid_placements
+    return _window_sums(padded, ship_size)
+
+
+def placement_density(blocked, ship_sizes):
+    """
+    blocked is a 2d boolean array of cells ships can't be on, ship_sizes is a list of the sizes of ships still afloat.
+    returns a 2d array with the number of placements of every ship that cover each cell, both horizontally and vertically.
+    """
+    blocked = blocked.astype(np.int64)
+    density = np.zeros(blocked.shape, dtype=np.int64)
+    for ship_size, count in Counter(ship_sizes).items():
+        density += count * _row_placement_density(blocked, ship_size)
+        density += count * _row_placement_density(blocked.T, ship_size).T
+    return density
+
+
+@players.register_player("density")
+class DensityAIPlayer(players.AIPlayer):
+    """
+    AI player that, when there is nothing on the attack stack, attacks the cell that the most placements of the
+    ships still afloat could cover, given the previous hits and misses (instead of a random unconnected cell).
+    Once there is a hit it behaves like AIPlayer. Requires numpy.
+    The best cells are cached by the Zobrist hash of the attacks and ships afloat (see transposition.py),
+    in the process's shared cache unless another cache is passed in, packed as an array of cells.
+    Only the first MAX_CACHED_ATTACKS attacks on boards up to MAX_CACHED_BOARD_SIZE are cached.
+    """
+
+    def __init__(self, name="AI", cache=None):
+        if np is None:
+            raise b_types.BattleshipError("numpy is required for DensityAIPlayer")
+        super().__init__(name)
+        self.afloat_ships = None  # ship to ship size for the opponent's ships that haven't been sunk
+        self.cache = cache
+        self.state_hash = None  # transposition.ObservedStateHash, from the first attack
+
+    def _get_afloat_ship_sizes(self):
+        return list(self.afloat_ships.values())
+
+    def _get_attacked_cells(self, board_size):
+        attacked = np.zeros(board_size * board_size, dtype=bool)
+        attacked[list(self.failed_attacks | self.successful_attacks)] = True
+        return attacked.reshape((board_size, board_size))
+
+    def _get_best_cells(self, board_size):
+        """
+        returns an array of the cells with the highest placement density, empty if no ship fits anywhere.
+        hits are treated as blocked since in this mode every hit is assumed to belong to a sunk ship.
+        """
+        attacked = self._get_attacked_cells(board_size)
+        density = placement_density(attacked, self._get_afloat_ship_sizes())
+        density[attacked] = -1
+        best_density = density.max()
+        cell_dtype = _get_cell_dtype(board_size)
+        if best_density <= 0:
+            return np.zeros(0, dtype=cell_dtype)
+        return np.flatnonzero(density == best_density).astype(cell_dtype)
+
+    def _pick_unconnected_coordinate(self, board_size):
+        """
+        chooses the cell with the highest placement density, breaking ties randomly.
+        falls back to a random unconnected coordinate if no ship fits anywhere.
+        """
+        attack_count = len(self.failed_attacks) + len(self.successful_attacks)
+        if board_size > MAX_CACHED_BOARD_SIZE or attack_count > MAX_CACHED_ATTACKS:
+            best_cells = self._get_best_cells(board_size)
+        else:
+            cache = self.cache if self.cache is not None else transposition.get_shared_cache()
+            key = ("density", board_size, self.state_hash.value)
+            packed_cells = cache.get(key)
+            if packed_cells is None:
+                best_cells = self._get_best_cells(board_size)
+                cache.put(key, best_cells.tobytes())
+            else:
+                best_cells = np.frombuffer(packed_cells, dtype=_get_cell_dtype(board_size))
+        if not len(best_cells):
+            return super()._pick_unconnected_coordinate(board_size)
+        return self.pool.get_coordinate(int(random.choice(best_cells)))
+
+    def choose_attack(self, board):
+        if self.afloat_ships is None:
+            self.afloat_ships = dict(board.get_fleet())
+            self.state_hash = transposition.ObservedStateHash(self._get_afloat_ship_sizes())
+        attack_result = super().choose_attack(board)
+        self.state_hash.add_attack(self.pool.get_cell(self.last_attack), attack_result.ship_hit)
+        if attack_result.sunk_ship_type:
+            sunk_ship_size = self.afloat_ships.pop(attack_result.sunk_ship_type, None)
+            if sunk_ship_size is not None:
+                self.state_hash.sink(sunk_ship_size)
+        return attack_result
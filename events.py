@@ -0,0 +1,227 @@
+"""
+Hooks for observing games without changing the game loop. A hook is passed to game.Game(hooks=[...]) and every event
+is called on it with the game first:
+on_game_start(game) -> before any ship is placed
+on_ship_placed(game, player, ship_type, starting_coordinate, direction, set_ship_seconds)
+on_attack_chosen(game, player, coordinate, choose_seconds) -> when the player calls set_attack,
+    choose_seconds is the time since the player's turn started
+on_attack_resolved(game, player, coordinate, attack_result, timing) -> after the player's choose_attack returns,
+    timing is a TurnTiming
+on_game_over(game, loser) -> loser is the name of the player who lost
+"""
+import bisect
+import cProfile
+import os
+import time
+from collections import namedtuple
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# choose_attack_seconds is the whole choose_attack call, set_attack_seconds only the board's set_attack within it
+TurnTiming = namedtuple('TurnTiming', ['choose_attack_seconds', 'set_attack_seconds'])
+
+
+class GameHook(object):
+    """
+    Base class for hooks, every event does nothing so subclasses only override the events they need.
+    """
+
+    def on_game_start(self, game):
+        pass
+
+    def on_ship_placed(self, game, player, ship_type, starting_coordinate, direction, set_ship_seconds):
+        pass
+
+    def on_attack_chosen(self, game, player, coordinate, choose_seconds):
+        pass
+
+    def on_attack_resolved(self, game, player, coordinate, attack_result, timing):
+        pass
+
+    def on_game_over(self, game, loser):
+        pass
+
+
+class ObservedBoard(object):
+    """
+    Wraps a game's board, timing every set_ship and set_attack the players make and sending the game's hooks
+    the ship placed and attack chosen events. Everything else goes to the board.
+    """
+
+    def __init__(self, board, game):
+        self.board = board
+        self.game = game
+        self.players = {player.name: player for player in game.players}
+        self.last_attack = None  # coordinate of the last successful set_attack
+        self.set_attack_seconds = 0.0  # time spent in set_attack since the last call to pop_attack
+
+    def __getattr__(self, name):
+        return getattr(self.board, name)
+
+    def set_ship(self, starting_coordinate, direction, ship_type, player_name):
+        start_time = time.perf_counter()
+        self.board.set_ship(starting_coordinate, direction, ship_type, player_name)
+        set_ship_seconds = time.perf_counter() - start_time
+        self.game.emit(
+            "on_ship_placed", self.players[player_name], ship_type, starting_coordinate, direction, set_ship_seconds)
+
+    def set_attack(self, coordinate, player_name):
+        start_time = time.perf_counter()
+        choose_seconds = start_time - self.game.turn_start_time
+        self.game.emit("on_attack_chosen", self.players[player_name], coordinate, choose_seconds)
+        try:
+            attack_result = self.board.set_attack(coordinate, player_name)
+        finally:
+            self.set_attack_seconds += time.perf_counter() - start_time
+        self.last_attack = coordinate
+        return attack_result
+
+    def pop_attack(self):
+        """
+        returns the last attack and the time spent in set_attack since the last call, including attacks that raised.
+        """
+        set_attack_seconds = self.set_attack_seconds
+        self.set_attack_seconds = 0.0
+        return self.last_attack, set_attack_seconds
+
+
+class Histogram(object):
+    """
+    counts of observed values per bucket (see LATENCY_BUCKETS), with their sum, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last count is for values above every bucket
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+
+    def count(self):
+        return sum(self.counts)
+
+
+def _format_labels(labels):
+    return ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels)
+
+
+class MetricsCollector(GameHook):
+    """
+    Counts games, placements, attacks and wins, and keeps latency histograms of choose_attack and set_attack
+    per player implementation (the player's class name). to_prometheus() returns them in the Prometheus text format.
+    If path is set, the file is rewritten after every game. Collectors from several processes can be merged.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.counters = {}  # (metric name, labels) to count, labels is a tuple of (label name, value)
+        self.histograms = {}  # (metric name, labels) to Histogram
+
+    def _increment(self, name, labels):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + 1
+
+    def _observe(self, name, labels, value):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram()
+        histogram.observe(value)
+
+    def on_game_start(self, game):
+        self._increment("battleship_games_started_total", ())
+
+    def on_ship_placed(self, game, player, ship_type, starting_coordinate, direction, set_ship_seconds):
+        self._increment("battleship_ships_placed_total", (("implementation", type(player).__name__),))
+
+    def on_attack_resolved(self, game, player, coordinate, attack_result, timing):
+        labels = (("implementation", type(player).__name__),)
+        if attack_result.sunk_ship_type:
+            result = "sunk"
+        elif attack_result.ship_hit:
+            result = "hit"
+        else:
+            result = "miss"
+        self._increment("battleship_attacks_total", labels + (("result", result),))
+        self._observe("battleship_choose_attack_seconds", labels, timing.choose_attack_seconds)
+        self._observe("battleship_set_attack_seconds", labels, timing.set_attack_seconds)
+
+    def on_game_over(self, game, loser):
+        for player in game.players:
+            outcome = "loss" if player.name == loser else "win"
+            self._increment("battleship_game_results_total", (
+                ("implementation", type(player).__name__), ("result", outcome)))
+        if self.path:
+            self.write(self.path)
+
+    def merge(self, other):
+        """
+        adds the counts of another collector (ie. from a worker process) to this one.
+        """
+        for key, count in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + count
+        for key, other_histogram in other.histograms.items():
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(other_histogram.buckets)
+            histogram.merge(other_histogram)
+
+    def to_prometheus(self):
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append("# TYPE %s counter" % name)
+            for (counter_name, labels), count in sorted(self.counters.items()):
+                if counter_name != name:
+                    continue
+                if labels:
+                    lines.append("%s{%s} %s" % (name, _format_labels(labels), count))
+                else:
+                    lines.append("%s %s" % (name, count))
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append("# TYPE %s histogram" % name)
+            for (histogram_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if histogram_name != name:
+                    continue
+                cumulative_count = 0
+                for upper_bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative_count += count
+                    lines.append("%s_bucket{%s} %s" % (
+                        name, _format_labels(labels + (("le", upper_bound),)), cumulative_count))
+                lines.append("%s_sum{%s} %s" % (name, _format_labels(labels), histogram.total))
+                lines.append("%s_count{%s} %s" % (name, _format_labels(labels), cumulative_count))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        writes the metrics to a temporary file then renames it over path, so scrapers never read a partial file.
+        """
+        temporary_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(temporary_path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+
+class ProfilingHook(GameHook):
+    """
+    Profiles a whole game with cProfile, from the game start to the game over, and dumps the stats to path
+    (readable with pstats). Only attach it to the games that should be profiled, since profiling slows the game down.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.profile = None
+
+    def on_game_start(self, game):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def on_game_over(self, game, loser):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+        self.profile = None
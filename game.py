@@ -1,46 +1,103 @@
 import random
-import battleship_types as b_types
+import time
 import board
+import events
 import players
 
 
 class Game(object):
     """
-    Primary class for the battleships game
+    Primary class for the battleships game.
+    By default a human plays against the AI, but any two players can be passed in with players_list,
+    and verbose=False turns off printing the game's messages to stdout, for headless games.
+    board_size and fleet (dict of ship to ship size, see battleship_types.make_fleet) configure the board.
+    hooks is a list of events.GameHook that are sent every game event, see events.py.
+    The game's messages are printed if verbose, and sent to every player's tell (ie. a human player on a socket).
+    if a recorder (records.GameRecorder) is passed in, every placement and attack is recorded.
     """
-    def __init__(self, player_name):
-        self.players = [players.HumanPlayer(player_name), players.AIPlayer()]
-        self.board = board.Board([p.name for p in self.players])
+    def __init__(self, player_name=None, players_list=None, board_class=board.Board, verbose=True,
+            board_size=board.DEFAULT_BOARD_SIZE, fleet=None, recorder=None, hooks=None):
+        if players_list is None:
+            players_list = [players.HumanPlayer(player_name), players.AIPlayer()]
+        self.players = players_list
+        self.verbose = verbose
+        for player in self.players:
+            player.verbose = verbose
+        self.board = board_class([p.name for p in self.players], board_size, fleet)
+        self.hooks = list(hooks or [])
+        if recorder:
+            self.hooks.append(recorder)
+        if self.hooks:
+            self.board = events.ObservedBoard(self.board, self)  # times the players' set_ship and set_attack calls
         self.player_turn_index = random.randrange(0, 2)
         self.turn_count = 1  # counts both players turns, ie. one players turn here counts as a single turn
-    
-    def start_game(self):
+        self.turn_start_time = None
+
+    def emit(self, event, *args):
         """
-        start game iterates through choosing ships, and choosing attacks.
+        calls the event (ie. "on_game_start") on every hook, with this game and args.
         """
-        print("Let's start by setting the ships!")
-        for ship_type in b_types.get_ship_sizes().keys():
+        for hook in self.hooks:
+            getattr(hook, event)(self, *args)
+
+    def _print(self, message):
+        if self.verbose:
+            print(message)
+        for player in self.players:
+            player.tell(message)
+
+    def place_ships(self):
+        """
+        has each player choose where to set each of their ships.
+        """
+        self._print("Let's start by setting the ships!")
+        for ship_type in self.board.get_fleet().keys():
             for player in self.players:
                 player.choose_ship(ship_type, self.board)
-        
-        print("Ships are all set, time to play!")
 
-        print(self.board.get_loser())
+        self._print("Ships are all set, time to play!")
+
+    def play_turn(self):
+        """
+        has the player whose turn it is attack, then passes the turn to the other player.
+        returns the attack result. If the player's attack raises an error, it is still their turn.
+        """
+        self._print("Turn %s"% str((self.turn_count + 1) // 2))  # Both players going counts as a single turn, hence the division
+        player = self.players[self.player_turn_index]
+        self.turn_start_time = time.perf_counter()
+        attack_result = player.choose_attack(self.board)
+        if self.hooks:
+            choose_attack_seconds = time.perf_counter() - self.turn_start_time
+            coordinate, set_attack_seconds = self.board.pop_attack()
+            self.emit("on_attack_resolved", player, coordinate, attack_result,
+                events.TurnTiming(choose_attack_seconds, set_attack_seconds))
+        self.turn_count += 1
+        self.player_turn_index = (self.player_turn_index + 1) % 2
+        next_player = self.players[self.player_turn_index]
+
+        if player.last_attack is not None:
+            self._print("%s attacks %s"% (player.name, players.format_coordinate(player.last_attack)))
+        if attack_result.sunk_ship_type:
+            self._print("%s sunk %s's ship!"% (player.name, next_player.name))
+        elif attack_result.ship_hit:
+            self._print("%s hit %s's ship!"% (player.name, next_player.name))
+        else:
+            self._print("miss by %s"% player.name)
+        return attack_result
+
+    def start_game(self):
+        """
+        start game iterates through choosing ships, and choosing attacks.
+        returns the name of the player who lost.
+        """
+        self.emit("on_game_start")
+        self.place_ships()
+
         while not self.board.get_loser():
-            self.turn_count += 1
-            print("Turn %s"% str(self.turn_count // 2))  # Both players going counts as a single turn, hence the division
-            player = self.players[self.player_turn_index]
-            attack_result = player.choose_attack(self.board)
-            self.player_turn_index = (self.player_turn_index + 1) % 2
-            next_player = self.players[self.player_turn_index]  
-
-            if attack_result.sunk_ship_type:
-                print("%s sunk %s's ship!"% (player.name, next_player.name))  
-            elif attack_result.ship_hit:
-                print("%s hit %s's ship!"% (player.name, next_player.name))  
-            else: 
-                print("miss by %s"% player.name)
-
-            player = next_player
+            self.play_turn()
         loser = self.board.get_loser()
-        print("%s has lost the game!"% loser)
+        self._print("%s has lost the game!"% loser)
+        for player in self.players:
+            player.game_over(loser)
+        self.emit("on_game_over", loser)
+        return loser
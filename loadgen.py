@@ -0,0 +1,222 @@
+"""
+Load generator for server.py: plays thousands of scripted clients against the server at once, each a whole game
+against the server's AI, to capacity test it locally. A share of every client's commands is malformed
+(see MALFORMED_COMMANDS), so the server's error handling is under load too.
+The latency of a command is the time from sending it to reading the server's next prompt, so it includes the AI's
+turn. Percentiles are reported per kind of command: placements, attacks (the turns), and malformed commands.
+Clients speak the line protocol of server.GameSession, or with --human the prompts of server.HumanSession.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import battleship_types as b_types
+import board
+import players
+
+DEFAULT_CLIENTS = 1000
+DEFAULT_CONCURRENCY = 500  # clients connected at once, below the open file limit of most systems
+DEFAULT_MALFORMED_RATE = 0.1
+CONNECT_ATTEMPTS = 50  # attempts to connect to a spawned server, 0.1 seconds apart
+MALFORMED_COMMANDS = (
+    "", "hello", "A", "A0", "Z99", "K1", "A11", "1A", "A1 sideways", "A1 A1 A1", "AUTO AUTO", "\x00\xff", "A" * 1000,
+)
+LINE_PROMPTS = ("PLACE", "YOUR TURN", "GAME OVER")
+HUMAN_PROMPTS = ("Please select", "GAME OVER")
+
+
+def _percentile(sorted_latencies, percentile):
+    """
+    nearest rank percentile, percentile is from 0 to 100
+    """
+    if not sorted_latencies:
+        return 0.0
+    rank = max(1, -(-percentile * len(sorted_latencies) // 100))
+    return sorted_latencies[int(rank) - 1]
+
+
+class LoadReport(object):
+    """
+    latencies of every command of every client, in seconds, by kind of command ("place", "attack" or "malformed").
+    """
+
+    def __init__(self):
+        self.latencies = {"place": [], "attack": [], "malformed": []}
+        self.errors = 0  # ERROR replies and invalid input messages
+        self.completed_clients = 0
+        self.failed_clients = 0
+        self.elapsed_seconds = 0.0
+
+    def add(self, kind, latency):
+        self.latencies[kind].append(latency)
+
+    def summary(self):
+        commands = sum(len(latencies) for latencies in self.latencies.values())
+        lines = ["%s clients completed, %s failed, %s commands (%s errors) in %.2f seconds, %.1f commands/second" % (
+            self.completed_clients, self.failed_clients, commands, self.errors, self.elapsed_seconds,
+            commands / self.elapsed_seconds if self.elapsed_seconds else 0.0)]
+        for kind, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            lines.append("%s latency ms: count %s p50 %.3f p90 %.3f p99 %.3f p99.9 %.3f max %.3f" % (
+                (kind, len(latencies)) + tuple(
+                    _percentile(latencies, percentile) * 1000 for percentile in (50, 90, 99, 99.9, 100))))
+        return "\n".join(lines)
+
+
+class ScriptedClient(object):
+    """
+    A client that plays a whole game, placing ships and attacking cells it hasn't attacked yet at random.
+    Each command is replaced by a malformed one with probability malformed_rate.
+    """
+
+    def __init__(self, rng, report, human=False, malformed_rate=DEFAULT_MALFORMED_RATE,
+            board_size=board.DEFAULT_BOARD_SIZE):
+        self.rng = rng
+        self.report = report
+        self.human = human
+        self.malformed_rate = malformed_rate
+        self.board_size = board_size
+        self.untried_cells = list(range(board_size * board_size))
+        rng.shuffle(self.untried_cells)
+
+    def _random_coordinate(self):
+        return players.format_coordinate(b_types.Coordinate(
+            self.rng.randrange(self.board_size), self.rng.randrange(self.board_size)))
+
+    def _next_attack(self):
+        cell = self.untried_cells.pop() if self.untried_cells else 0
+        return players.format_coordinate(b_types.Coordinate(cell // self.board_size, cell % self.board_size))
+
+    def _choose_command(self, prompt, placing):
+        """
+        returns the kind and the line to send for a prompt of the server.
+        """
+        if self.rng.random() < self.malformed_rate:
+            return "malformed", self.rng.choice(MALFORMED_COMMANDS)
+        if self.human:
+            if "direction" in prompt:
+                return "place", self.rng.choice(list(players.SHIP_DIRECTIONS))
+            return ("place" if placing else "attack"), (self._random_coordinate() if placing else self._next_attack())
+        if prompt.startswith("PLACE"):
+            return "place", "%s %s" % (self._random_coordinate(), self.rng.choice(list(players.SHIP_DIRECTIONS)))
+        return "attack", self._next_attack()
+
+    async def _read_until_prompt(self, reader):
+        """
+        returns the lines the server sent up to and including its next prompt.
+        """
+        prompts = HUMAN_PROMPTS if self.human else LINE_PROMPTS
+        lines = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("The server closed the connection")
+            line = line.decode(errors="replace").rstrip("\r\n")
+            lines.append(line)
+            if line.startswith(prompts):
+                return lines
+
+    async def play(self, reader, writer):
+        placing = True  # for human sessions, whether the prompts are for placing a ship or for an attack
+        lines = await self._read_until_prompt(reader)
+        while not lines[-1].startswith("GAME OVER"):
+            if self.human and any("choose where to attack" in line for line in lines):
+                placing = False
+            kind, command = self._choose_command(lines[-1], placing)
+            start_time = time.perf_counter()
+            writer.write((command + "\n").encode())
+            await writer.drain()
+            lines = await self._read_until_prompt(reader)
+            self.report.add(kind, time.perf_counter() - start_time)
+            self.report.errors += sum(1 for line in lines if line.startswith(("ERROR", "Invalid")))
+        if not self.human:
+            writer.write(b"QUIT\n")
+            await writer.drain()
+
+
+async def _run_client(client_index, args, report, semaphore):
+    async with semaphore:
+        rng = random.Random("%s:%s" % (args.seed, client_index))
+        client = ScriptedClient(rng, report, args.human, args.malformed_rate)
+        try:
+            if args.unix:
+                reader, writer = await asyncio.open_unix_connection(args.unix)
+            else:
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+        except OSError:
+            report.failed_clients += 1
+            return
+        try:
+            await client.play(reader, writer)
+            report.completed_clients += 1
+        except (ConnectionError, OSError):
+            report.failed_clients += 1
+        finally:
+            writer.close()
+
+
+async def _wait_for_server(args):
+    for _ in range(CONNECT_ATTEMPTS):
+        try:
+            if args.unix:
+                _, writer = await asyncio.open_unix_connection(args.unix)
+            else:
+                _, writer = await asyncio.open_connection(args.host, args.port)
+            writer.write(b"QUIT\n")
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise ConnectionError("The server didn't start")
+
+
+async def run_load(args):
+    """
+    plays args.clients games, at most args.concurrency at once, returns the LoadReport.
+    """
+    report = LoadReport()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    start_time = time.perf_counter()
+    await asyncio.gather(*(_run_client(client_index, args, report, semaphore) for client_index in range(args.clients)))
+    report.elapsed_seconds = time.perf_counter() - start_time
+    return report
+
+
+async def _spawn_and_run(args):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"), "--quiet"]
+    command += ["--unix", args.unix] if args.unix else ["--host", args.host, "--port", str(args.port)]
+    if args.human:
+        command.append("--human")
+    server_process = subprocess.Popen(command)
+    try:
+        await _wait_for_server(args)
+        return await run_load(args)
+    finally:
+        server_process.terminate()
+        server_process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays scripted clients against server.py and reports latencies.")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--malformed-rate", type=float, default=DEFAULT_MALFORMED_RATE,
+        help="share of commands replaced by malformed ones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="path of the server's unix socket, instead of tcp")
+    parser.add_argument("--human", action="store_true", help="play the prompts of a server started with --human")
+    parser.add_argument("--spawn", action="store_true", help="start server.py for the run, instead of using a running one")
+    args = parser.parse_args()
+
+    report = asyncio.run(_spawn_and_run(args) if args.spawn else run_load(args))
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import concurrent.futures
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+
+import placements
+import players
+
+DEFAULT_MOVE_BUDGET = 0.1  # seconds of wall clock time per move
+RESULT_MARGIN = 0.005  # seconds at the end of the budget kept for workers to send back their counts
+
+# what the player knows about the opponent's board. hits and misses are tuples of cells (row * board_size + col),
+# sinks has the cell of the attack that sunk each ship and the size of that ship.
+Observation = namedtuple('Observation', ['board_size', 'hits', 'misses', 'sinks', 'afloat_ship_sizes'])
+
+
+def _sample_fleet(observation, table, hit_mask, miss_mask, sink_candidates, rng):
+    """
+    samples a placement of every ship that is consistent with the observation: sunk ships are only on hits and
+    cover the attack that sunk them, no ship is on a miss, every hit is covered, and no ship still afloat is only on hits.
+    Ships still afloat are placed over a hit that isn't covered yet while there are any, so samples are rarely rejected,
+    which makes the samples approximately (not exactly) uniform.
+    returns the cells of the ships still afloat that haven't been attacked, or None if the sample was rejected.
+    """
+    occupied_mask = 0
+    for candidates, ship_size in sink_candidates:
+        fitting = [i for i in candidates if not table.get_mask(ship_size, i) & occupied_mask]
+        if not fitting:
+            return None
+        occupied_mask |= table.get_mask(ship_size, rng.choice(fitting))
+
+    uncovered_hits = [cell for cell in observation.hits if not (occupied_mask >> cell) & 1]
+    afloat_ship_sizes = list(observation.afloat_ship_sizes)
+    rng.shuffle(afloat_ship_sizes)
+    afloat_cells = []
+    for ship_size in afloat_ship_sizes:
+        blocked_mask = occupied_mask | miss_mask
+        if uncovered_hits:
+            fitting = [
+                i for i in table.get_placements_covering(ship_size, rng.choice(uncovered_hits))
+                if not table.get_mask(ship_size, i) & blocked_mask and table.get_mask(ship_size, i) & ~hit_mask
+            ]
+            placement_index = rng.choice(fitting) if fitting else None
+        else:
+            placement_index = table.sample(ship_size, blocked_mask, rng)
+        if placement_index is None:
+            return None
+        ship_mask = table.get_mask(ship_size, placement_index)
+        occupied_mask |= ship_mask
+        cells = table.get_cells(ship_size, placement_index)
+        afloat_cells.extend(cell for cell in cells if not (hit_mask >> cell) & 1)
+        if uncovered_hits:
+            uncovered_hits = [cell for cell in uncovered_hits if not (ship_mask >> cell) & 1]
+    if uncovered_hits:
+        return None
+    return afloat_cells
+
+
+def sample_shot_counts(observation, deadline, seed):
+    """
+    samples fleets consistent with the observation until deadline (a time.time() value).
+    returns, for every cell, the number of samples with an afloat ship on that cell, and the number of samples.
+    This is a module level function so it can run in worker processes.
+    """
+    rng = random.Random(seed)
+    table = placements.get_placement_table(observation.board_size)
+    hit_mask = sum(1 << cell for cell in observation.hits)
+    miss_mask = sum(1 << cell for cell in observation.misses)
+    sink_candidates = [
+        ([i for i in table.get_placements_covering(ship_size, cell) if not table.get_mask(ship_size, i) & ~hit_mask],
+            ship_size)
+        for cell, ship_size in observation.sinks
+    ]
+    counts = [0] * (observation.board_size * observation.board_size)
+    samples = 0
+    while time.time() < deadline:
+        afloat_cells = _sample_fleet(observation, table, hit_mask, miss_mask, sink_candidates, rng)
+        if afloat_cells is None:
+            continue
+        samples += 1
+        for cell in afloat_cells:
+            counts[cell] += 1
+    return counts, samples
+
+
+@players.register_player("montecarlo")
+class MonteCarloAIPlayer(players.AIPlayer):
+    """
+    AI player that samples fleets consistent with everything it has seen (hits, misses and which ships were sunk where),
+    and attacks the cell that has a ship on it in the most samples. Each move samples for at most move_budget seconds,
+    spread across workers processes (0 samples in this process). If no sample is found in time it attacks like AIPlayer.
+    Worker processes are started on the first attack, before its budget starts, and stopped by close(),
+    which the game calls once it's over (see game_over).
+    """
+
+    def __init__(self, name="AI", move_budget=DEFAULT_MOVE_BUDGET, workers=None):
+        super().__init__(name)
+        if workers is None:
+            # daemon processes (ie. the simulation's pool) can't start processes of their own
+            workers = 0 if multiprocessing.current_process().daemon else os.cpu_count()
+        self.move_budget = move_budget
+        self.workers = workers
+        self.executor = None
+        self.afloat_ships = None  # ship to ship size for the opponent's ships that haven't been sunk
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["executor"] = None
+        return state
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def game_over(self, loser):
+        self.close()
+
+    def _start_workers(self):
+        """
+        starts the worker processes, if they aren't already, and waits for every one to be ready,
+        so starting them isn't part of a move's budget.
+        """
+        if self.workers and self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            list(self.executor.map(abs, range(self.workers)))
+
+    def _get_observation(self, board_size):
+        return Observation(
+            board_size,
+            tuple(self.successful_attacks),
+            tuple(self.failed_attacks),
+            tuple(self.sinks),
+            tuple(self.afloat_ships.values()))
+
+    def _sample(self, observation, deadline):
+        if not self.workers:
+            return sample_shot_counts(observation, deadline - RESULT_MARGIN, random.getrandbits(64))
+
+        futures = [
+            self.executor.submit(sample_shot_counts, observation, deadline - RESULT_MARGIN, random.getrandbits(64))
+            for _ in range(self.workers)
+        ]
+        done, not_done = concurrent.futures.wait(futures, timeout=max(0, deadline - time.time()))
+        for future in not_done:
+            future.cancel()
+        counts = [0] * (observation.board_size * observation.board_size)
+        samples = 0
+        for future in done:
+            worker_counts, worker_samples = future.result()
+            samples += worker_samples
+            for cell, count in enumerate(worker_counts):
+                counts[cell] += count
+        return counts, samples
+
+    def _pick_coordinate(self, board_size):
+        """
+        attacks the cell with a ship on it in the most samples, breaking ties randomly.
+        """
+        self._start_workers()
+        deadline = time.time() + self.move_budget
+        counts, samples = self._sample(self._get_observation(board_size), deadline)
+        if samples == 0:
+            return super()._pick_coordinate(board_size)
+        untouched_cells = self.untouched_cells.cells if self.untouched_cells else range(board_size * board_size)
+        best_count = max(counts[cell] for cell in untouched_cells)
+        best_cells = [cell for cell in untouched_cells if counts[cell] == best_count]
+        return self.pool.get_coordinate(random.choice(best_cells))
+
+    def choose_attack(self, board):
+        if self.afloat_ships is None:
+            self.afloat_ships = dict(board.get_fleet())
+        attack_result = super().choose_attack(board)
+        if attack_result.sunk_ship_type:
+            self.afloat_ships.pop(attack_result.sunk_ship_type)
+        return attack_result
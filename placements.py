@@ -0,0 +1,143 @@
+import functools
+import random
+
+import battleship_types as b_types
+
+ATTEMPTS_BEFORE_ENUMERATING = 32  # random placements tried before listing every placement that fits
+FLEET_ATTEMPTS = 100  # fleets started over before giving up, when a ship has nowhere to go
+PRECOMPUTE_LIMIT = 64 * 64  # boards with at most this many cells have every placement mask precomputed
+
+HORIZONTAL = b_types.Coordinate(0, 1)
+VERTICAL = b_types.Coordinate(1, 0)
+
+
+class PlacementTable(object):
+    """
+    Every legal placement of a ship of each size on a board, as bitmasks where the bit for a coordinate is
+    row * board_size + col (the same as bitboard.BitBoard). Placements are numbered, horizontal ones first,
+    so a placement is picked by choosing a random number. For small boards the masks of every placement are
+    precomputed, for larger boards they are computed from the placement number when needed.
+    """
+
+    def __init__(self, board_size):
+        self.board_size = board_size
+        self.precomputed_masks = {}  # ship size to list of masks, only for small boards
+
+    def count(self, ship_size):
+        """
+        returns the number of legal placements for a ship of ship_size.
+        """
+        if ship_size > self.board_size:
+            return 0
+        return 2 * self.board_size * (self.board_size - ship_size + 1)
+
+    def get_placement(self, ship_size, placement_index):
+        """
+        returns the starting coordinate and direction of a placement.
+        """
+        starts_per_line = self.board_size - ship_size + 1
+        line_count = self.board_size * starts_per_line
+        if placement_index < line_count:
+            return b_types.Coordinate(
+                placement_index // starts_per_line, placement_index % starts_per_line), HORIZONTAL
+        placement_index -= line_count
+        return b_types.Coordinate(
+            placement_index % starts_per_line, placement_index // starts_per_line), VERTICAL
+
+    def get_cells(self, ship_size, placement_index):
+        """
+        returns the cells (row * board_size + col) a placement covers.
+        """
+        starting_coordinate, direction = self.get_placement(ship_size, placement_index)
+        starting_cell = starting_coordinate.row * self.board_size + starting_coordinate.col
+        step = 1 if direction == HORIZONTAL else self.board_size
+        return [starting_cell + i * step for i in range(ship_size)]
+
+    def get_placements_covering(self, ship_size, cell):
+        """
+        returns the index of every placement of a ship of ship_size that covers the cell.
+        """
+        if ship_size > self.board_size:
+            return []
+        starts_per_line = self.board_size - ship_size + 1
+        line_count = self.board_size * starts_per_line
+        row, col = cell // self.board_size, cell % self.board_size
+        placement_indexes = [
+            row * starts_per_line + start
+            for start in range(max(0, col - ship_size + 1), min(col, starts_per_line - 1) + 1)
+        ]
+        placement_indexes.extend(
+            line_count + col * starts_per_line + start
+            for start in range(max(0, row - ship_size + 1), min(row, starts_per_line - 1) + 1)
+        )
+        return placement_indexes
+
+    def _compute_mask(self, ship_size, placement_index):
+        starting_coordinate, direction = self.get_placement(ship_size, placement_index)
+        if direction == HORIZONTAL:
+            ship_mask = (1 << ship_size) - 1
+        else:
+            ship_mask = sum(1 << (i * self.board_size) for i in range(ship_size))
+        return ship_mask << (starting_coordinate.row * self.board_size + starting_coordinate.col)
+
+    def get_mask(self, ship_size, placement_index):
+        masks = self.precomputed_masks.get(ship_size)
+        if masks is None and self.board_size * self.board_size <= PRECOMPUTE_LIMIT:
+            masks = [self._compute_mask(ship_size, i) for i in range(self.count(ship_size))]
+            self.precomputed_masks[ship_size] = masks
+        if masks is not None:
+            return masks[placement_index]
+        return self._compute_mask(ship_size, placement_index)
+
+    def sample(self, ship_size, occupied_mask, rng=random):
+        """
+        returns the index of a placement chosen uniformly out of the placements that don't overlap occupied_mask,
+        or None if there aren't any. Random placements are tried first, since on most boards nearly all fit.
+        """
+        count = self.count(ship_size)
+        if count == 0:
+            return None
+        for _ in range(ATTEMPTS_BEFORE_ENUMERATING):
+            placement_index = rng.randrange(count)
+            if not self.get_mask(ship_size, placement_index) & occupied_mask:
+                return placement_index
+        fitting = [i for i in range(count) if not self.get_mask(ship_size, i) & occupied_mask]
+        return rng.choice(fitting) if fitting else None
+
+
+@functools.lru_cache(maxsize=None)
+def get_placement_table(board_size):
+    """
+    placement tables are shared by every game with the same board size.
+    """
+    return PlacementTable(board_size)
+
+
+def generate_fleet(fleet, board_size, rng=random):
+    """
+    returns a list of (ship, starting coordinate, direction) for every ship in the fleet (dict of ship to ship size),
+    each placed uniformly out of the placements that don't overlap the ships placed before it.
+    """
+    table = get_placement_table(board_size)
+    for _ in range(FLEET_ATTEMPTS):
+        occupied_mask = 0
+        placed_ships = []
+        for ship, ship_size in fleet.items():
+            placement_index = table.sample(ship_size, occupied_mask, rng)
+            if placement_index is None:
+                break
+            occupied_mask |= table.get_mask(ship_size, placement_index)
+            placed_ships.append((ship,) + table.get_placement(ship_size, placement_index))
+        else:
+            return placed_ships
+    raise b_types.BattleshipError("The fleet doesn't fit on the board")
+
+
+def generate_fleets(count, fleet=None, board_size=10, seed=None):
+    """
+    yields count fleets from generate_fleet, for seeding simulations. The same seed always yields the same fleets.
+    """
+    fleet = fleet or b_types.get_ship_sizes()
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield generate_fleet(fleet, board_size, rng)
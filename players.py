@@ -1,11 +1,76 @@
+import array
+import functools
 import random
 import battleship_types as b_types
+import clusters
+import placements
+import render
+import transports
+
+SHIP_DIRECTIONS = {
+    "down": b_types.Coordinate(1, 0),
+    "up": b_types.Coordinate(-1, 0),
+    "right": b_types.Coordinate(0, 1),
+    "left": b_types.Coordinate(0, -1),
+}
+
+
+def parse_coordinate(coordinate_string):
+    """
+    parses a coordinate in the format of <Letter><Number> (ie. A6), returns None if it's not in that format.
+    """
+    if len(coordinate_string) < 2:
+        return None
+
+    # first character will be converted from uppercase letter to number from 0 to 25, where the number if the letter of the alphabet
+    # we don't need to worry about inbounds here since it's handled by set_ship on the board
+    row = ord(coordinate_string[0].lower()) - 97
+    try:
+        col = int(coordinate_string[1:]) - 1
+    except ValueError:
+        return None
+    return b_types.Coordinate(row, col)
+
+
+def parse_direction(direction_string):
+    """
+    parses a ship direction (up, down, left, right), returns None if it isn't one of those.
+    """
+    return SHIP_DIRECTIONS.get(direction_string)
+
+
+def format_coordinate(coordinate):
+    """
+    formats a coordinate in the same format as parse_coordinate (ie. A6)
+    """
+    return "%s%s"% (chr(coordinate.row + 97).upper(), coordinate.col + 1)
+
+
+PLAYER_REGISTRY = {}  # name to a picklable factory that takes a player name and returns a Player, see register_player
+
+
+def register_player(name, factory=None):
+    """
+    adds a Player implementation to PLAYER_REGISTRY, so simulations and tournaments can use it by name.
+    can be called directly, or used as a class decorator with only the name.
+    """
+    if factory is None:
+        return lambda decorated_factory: register_player(name, decorated_factory)
+    if PLAYER_REGISTRY.get(name, factory) is not factory:
+        raise b_types.BattleshipError("A player is already registered as %s" % name)
+    PLAYER_REGISTRY[name] = factory
+    return factory
+
 
 class Player(object):
     """
     Base class for players, used by AI and Human players. Must implement name, choose_ship and choose_attack method.
+    verbose is set by the game to whether it prints its messages to stdout, see HumanPlayer.tell.
+    choose_attack sets last_attack to the coordinate attacked, so the game can tell both players where it was.
     """
     name = None
+    verbose = True
+    last_attack = None
 
     def choose_ship(self, ship_type, board):
         """
@@ -19,83 +84,137 @@ class Player(object):
         """ 
         raise Exception("Unimplemented")
 
+    def tell(self, message):
+        """
+        called with every message of the game (ie. the result of each attack), for players that show them to someone
+        other than through the game's own printing.
+        """
+        pass
 
-class AIPlayer(Player):
+    def game_over(self, loser):
+        """
+        called by the game once it's over, for players that need to clean up.
+        """
+        pass
+
+
+@functools.lru_cache(maxsize=8)
+def _get_cell_range(cell_count):
     """
-    AI player that plays against a human
+    array of the cells 0 to cell_count - 1, copied (a memcpy) by every CandidateCells of that size.
     """
-    successful_attacks = set()
-    failed_attacks = set()
-    adjacent_coordinates = set()  # adjacent coordinates to failed attacks
-    name = "AI"
-    attack_stack = []  # list of attacks stored in a stack, see _pick_potential_coordinate for more
-    potential_ship_direction = None
+    return array.array('i', range(cell_count))
 
-    def choose_ship(self, ship_type, board):
-        """
-        randomly chooses place to set ship in bounds, either horizontal or vertical
-        """
-        ship_size = b_types.get_ship_sizes().get(ship_type)
 
-        if random.randrange(0, 2):  # to randomly decide vertical or horizontal
-            vertical_offset = ship_size  
-            horizontal_offset = 0
-            direction = b_types.Coordinate(1, 0)
-        else:
-            vertical_offset = 0
-            horizontal_offset = ship_size
-            direction = b_types.Coordinate(0, 1)
-        
-        # offsets prevent ship from going off matrix
-        row_val = random.randrange(0, board.get_board_size() - vertical_offset)
-        col_val = random.randrange(0, board.get_board_size() - horizontal_offset)
-        try:
-            board.set_ship(b_types.Coordinate(
-                row_val, 
-                col_val), direction, ship_type, self.name)
-        except b_types.BattleshipError:
-            return self.choose_ship(ship_type, board)
+class CandidateCells(object):
+    """
+    set of the cells 0 to cell_count - 1 (see battleship_types.CoordinatePool), with O(1) removal and random choice.
+    cells is an unordered array of the cells left, positions has the index of every cell in that array (or -1 once
+    removed), so a cell is removed by moving the last cell in the array into its position.
+    Both are arrays of 32 bit ints rather than lists, so a large board costs 8 bytes per cell.
+    """
+
+    def __init__(self, cell_count):
+        self.cells = _get_cell_range(cell_count)[:]
+        self.positions = _get_cell_range(cell_count)[:]
 
+    def __len__(self):
+        return len(self.cells)
 
-    def _convert_int_to_coordinate(self, input_int, board_size):
+    def remove(self, cell):
+        position = self.positions[cell]
+        if position < 0:
+            return
+        self.positions[cell] = -1
+        last_cell = self.cells.pop()
+        if last_cell != cell:
+            self.cells[position] = last_cell
+            self.positions[last_cell] = position
+
+    def choose(self):
+        return random.choice(self.cells)
+
+
+@register_player("ai")
+class AIPlayer(Player):
+    """
+    AI player that plays against a human, or another AI (give each AI a different name).
+    Attacks are tracked by cell (row * board_size + col) with the board size's battleship_types.CoordinatePool,
+    a Coordinate is only looked up for the attack passed to the board.
+    """
+
+    def __init__(self, name="AI"):
+        self.name = name
+        self.pool = None  # battleship_types.CoordinatePool, from the first attack
+        self.successful_attacks = set()  # cells
+        self.failed_attacks = set()  # cells
+        self.attack_stack = []  # list of cells of attacks stored in a stack, see _pick_potential_coordinate for more
+        self.hit_ranks = {}  # cell of every successful attack to the order it was in
+        self.sinks = []  # (cell, ship size) of every attack that sunk a ship
+        self.resolved_mask = 0  # cells of hits that must be on a sunk ship, see _remove_sunk_ships_from_attack_stack
+        self.potential_ship_direction = None  # index in ALL_DIRECTIONS
+        self.untouched_cells = None
+        self.unconnected_cells = None
+        self.last_attack = None
+        self.occupied_mask = 0  # cells of this player's ships, see choose_ship
+
+    def _get_occupied_mask(self, board):
         """
-        assuming input is an integer from 0 to board length * board length, convert to corresponding coordinate
+        mask of the cells this player's ships are on (see placements.PlacementTable), read from the ocean matrix.
         """
-        row = input_int // board_size
-        col = input_int % board_size
-        return b_types.Coordinate(row, col)
+        occupied_mask = 0
+        ships_matrix = board.get_matrixes(self.name)[1]
+        for row_index, row in enumerate(ships_matrix):
+            for col_index, symbol in enumerate(row):
+                if symbol != ' ':
+                    occupied_mask |= 1 << (row_index * board.get_board_size() + col_index)
+        return occupied_mask
 
-    def _convert_coordinate_to_int(self, coordinate, board_size):
+    def choose_ship(self, ship_type, board):
         """
-        assuming input is coordinate on the board, converts it to an integer version of the coordinate
+        randomly chooses place to set ship in bounds, either horizontal or vertical,
+        uniformly out of the placements that don't overlap the ships already set (see placements.py).
         """
-        return coordinate.row * board_size + coordinate.col
-
-    def _failed_attacks_as_ints(self, board_size):
-        return [ self._convert_coordinate_to_int(failed_attack, board_size) for failed_attack in self.failed_attacks]
-
-    def _successful_attacks_as_ints(self, board_size):
-        return [ self._convert_coordinate_to_int(successful_attack, board_size) for successful_attack in self.successful_attacks]
+        table = placements.get_placement_table(board.get_board_size())
+        ship_size = board.get_ship_size(ship_type)
+        placement_index = table.sample(ship_size, self.occupied_mask)
+        if placement_index is None:
+            raise b_types.BattleshipError("No room left for ship")
+        starting_coordinate, direction = table.get_placement(ship_size, placement_index)
+        if board.validate_ship(starting_coordinate, direction, ship_type, self.name) is not b_types.MoveStatus.OK:
+            # ships were set on this board without this player knowing, so read where they are and sample again
+            self.occupied_mask = self._get_occupied_mask(board)
+            placement_index = table.sample(ship_size, self.occupied_mask)
+            if placement_index is None:
+                raise b_types.BattleshipError("No room left for ship")
+            starting_coordinate, direction = table.get_placement(ship_size, placement_index)
+        board.set_ship(starting_coordinate, direction, ship_type, self.name)
+        self.occupied_mask |= table.get_mask(ship_size, placement_index)
 
-    def _adjacent_coordinates_as_ints(self, board_size):
-        return [ self._convert_coordinate_to_int(adjacent_coordinate, board_size) for adjacent_coordinate in self.adjacent_coordinates]
+    def _get_candidate_cells(self, board_size):
+        """
+        lazily creates the candidate cells once the board size is known.
+        untouched_cells are the cells that haven't been attacked, unconnected_cells are the untouched cells
+        that also aren't adjacent to a failed attack. Both are updated after every attack in choose_attack.
+        """
+        if self.untouched_cells is None:
+            self.untouched_cells = CandidateCells(board_size * board_size)
+            self.unconnected_cells = CandidateCells(board_size * board_size)
+        return self.untouched_cells, self.unconnected_cells
 
     def _pick_unconnected_coordinate(self, board_size):
         """
         chooses an attack randomly out of any of the valid coordinates (in bounds and not previously attacked).
         try not to pick an adjacent coordinate to a failed attack, unless there are no other options.
         """
-        excluded_coordinates = self._failed_attacks_as_ints(board_size) + self._successful_attacks_as_ints(board_size)
-        adjacent_coordinates = self._adjacent_coordinates_as_ints(board_size)
-        
+        untouched_cells, unconnected_cells = self._get_candidate_cells(board_size)
+
         # if there is are any remaining coordinates without the adjacent ones to the failed attacks, choose out of those
-        remaining_without_adjacent = [i for i in range(0, board_size * board_size) if i not in excluded_coordinates + adjacent_coordinates]
-        if len(remaining_without_adjacent) > 0 :
-            return self._convert_int_to_coordinate(random.choice(remaining_without_adjacent), board_size)
+        if len(unconnected_cells) > 0:
+            return self.pool.get_coordinate(unconnected_cells.choose())
 
         # otherwise, choose out of the excluded
-        unconnected_int = random.choice([i for i in range(0, board_size * board_size) if i not in excluded_coordinates])
-        return self._convert_int_to_coordinate(unconnected_int, board_size)
+        return self.pool.get_coordinate(untouched_cells.choose())
 
     def _pick_potential_coordinate(self, board_size):
         """
@@ -106,180 +225,187 @@ class AIPlayer(Player):
         last attack to iterate to the next potential attack
         if that was already tried, use one of the other directions that haven't been attempted
         If all of the directions have been attempted, pop the last attack from the stack and try with the last attack
-        If there are no attacks, return None. (We also have logic for removing potential ships from the stack whenk sunk, see: _remove_potential_ship_from_attack_stack)
-        """
-        if len(self.attack_stack) == 0:
-            return None 
-
-        # try using the last potential direction stored first
-        if self.potential_ship_direction:
-            potential_next_coordinate = self.attack_stack[-1] + self.potential_ship_direction
-            if potential_next_coordinate.within_bounds(board_size) and \
-                not (potential_next_coordinate in self.failed_attacks or potential_next_coordinate in self.successful_attacks):
-                return potential_next_coordinate
-            else:
-                self.potential_ship_direction = None
-                    
-        # potential ship direction yielded an out of bounds or attack that was already attempted, try another direction
-        # use random direction for order of trying different directions
-        for direction in random.sample(b_types.ALL_DIRECTIONS, len(b_types.ALL_DIRECTIONS)): 
-            potential_next_coordinate = self.attack_stack[-1] + direction
-            if potential_next_coordinate.within_bounds(board_size) and \
-                not (potential_next_coordinate in self.failed_attacks or potential_next_coordinate in self.successful_attacks):
-                self.potential_ship_direction = direction
-                return potential_next_coordinate
-        
-        # we exhausted all directions for this attack, try the last one
-        self.attack_stack.pop()
-        return self._pick_potential_coordinate(board_size)
-
-    def _remove_potential_ship_from_attack_stack(self):
-        """
-        """
-        curr = self.attack_stack.pop()
-        while curr:
-            if len(self.attack_stack) > 0 and self.potential_ship_direction and\
-                (self.attack_stack[-1] + self.potential_ship_direction) == curr:
-                curr = self.attack_stack.pop()
-            else:
-                return
-            
-    def choose_attack(self, board):
+        If there are no attacks, return None. (We also have logic for removing sunk ships from the stack, see: _remove_sunk_ships_from_attack_stack)
+        Neighbours are looked up in the coordinate pool's tables, where None is out of bounds.
+        """
+        while self.attack_stack:
+            # try using the last potential direction stored first
+            if self.potential_ship_direction is not None:
+                potential_next_cell = self.pool.get_neighbour(self.attack_stack[-1], self.potential_ship_direction)
+                if potential_next_cell is not None and \
+                    not (potential_next_cell in self.failed_attacks or potential_next_cell in self.successful_attacks):
+                    return self.pool.get_coordinate(potential_next_cell)
+                else:
+                    self.potential_ship_direction = None
+
+            # potential ship direction yielded an out of bounds or already attempted attack, try another direction
+            # use random direction for order of trying different directions
+            for direction_index in random.sample(range(len(b_types.ALL_DIRECTIONS)), len(b_types.ALL_DIRECTIONS)):
+                potential_next_cell = self.pool.get_neighbour(self.attack_stack[-1], direction_index)
+                if potential_next_cell is not None and \
+                    not (potential_next_cell in self.failed_attacks or potential_next_cell in self.successful_attacks):
+                    self.potential_ship_direction = direction_index
+                    return self.pool.get_coordinate(potential_next_cell)
+
+            # we exhausted all directions for this attack, try the last one
+            self.attack_stack.pop()
+        return None
+
+    def _remove_sunk_ships_from_attack_stack(self, sunk_cell, board_size):
+        """
+        rebuilds the attack stack from the hits that could still belong to a ship afloat, after the attack on sunk_cell
+        sunk a ship. Works out which hits the sunk ships were on even when ships are next to each other,
+        by solving the cluster of hits of the sunk ship (see clusters.py).
         """
-        choose attack based on two primary strategies 
+        cluster_mask, cluster_resolved_mask = clusters.resolve_cluster(
+            self.hit_ranks, dict(self.sinks), sunk_cell, board_size)
+        self.resolved_mask = (self.resolved_mask & ~cluster_mask) | cluster_resolved_mask
+        self.attack_stack = [cell for cell in self.hit_ranks if not (self.resolved_mask >> cell) & 1]
+
+    def _pick_coordinate(self, board_size):
+        """
+        pick coordinate based on two primary strategies
         (see _get_potential_coordinate and _pick_unconnected_coordinate for more).
         """
-        board_size = board.get_board_size()
-        
         coordinate = self._pick_potential_coordinate(board_size)
-                    
+
         if not coordinate:
             coordinate = self._pick_unconnected_coordinate(board_size)
+        return coordinate
+
+    def choose_attack(self, board):
+        """
+        choose attack with _pick_coordinate, then keeps track of the result.
+        """
+        board_size = board.get_board_size()
+        if self.pool is None:
+            self.pool = b_types.get_coordinate_pool(board_size)
+        coordinate = self._pick_coordinate(board_size)
         attack_result = board.set_attack(coordinate, self.name)
+        untouched_cells, unconnected_cells = self._get_candidate_cells(board_size)
+        attacked_cell = self.pool.get_cell(coordinate)
+        untouched_cells.remove(attacked_cell)
+        unconnected_cells.remove(attacked_cell)
         if attack_result.ship_hit:
-            self.successful_attacks.add(coordinate)
-            self.attack_stack.append(coordinate)
+            self.successful_attacks.add(attacked_cell)
+            self.attack_stack.append(attacked_cell)
+            self.hit_ranks[attacked_cell] = len(self.hit_ranks)
             if attack_result.sunk_ship_type:
-                self._remove_potential_ship_from_attack_stack()
-                self.potential_ship_direction = None 
+                self.sinks.append((attacked_cell, board.get_ship_size(attack_result.sunk_ship_type)))
+                self._remove_sunk_ships_from_attack_stack(attacked_cell, board_size)
+                self.potential_ship_direction = None
         else: 
             self.potential_ship_direction = None
-            self.failed_attacks.add(coordinate)
-            for direction in b_types.ALL_DIRECTIONS:
-                current_coordinate = coordinate + direction
-                if current_coordinate.within_bounds(board_size):
-                    self.adjacent_coordinates.add(current_coordinate)
-        print("%s attacks %s%s"% (self.name, chr(coordinate.row +97).upper(), coordinate.col + 1))
+            self.failed_attacks.add(attacked_cell)
+            for direction_index in range(len(b_types.ALL_DIRECTIONS)):
+                adjacent_cell = self.pool.get_neighbour(attacked_cell, direction_index)
+                if adjacent_cell is not None:
+                    unconnected_cells.remove(adjacent_cell)
+        self.last_attack = coordinate
         return attack_result
 
 
 class HumanPlayer(Player):
     """
     For a human player to play in the terminal. Includes printing board, taking input, returning invalid inputs...etc.
+    Input and output go through a transport (see transports.py), the terminal unless another one is passed in,
+    so a human seat can also be played over a connection or driven by a script. The game's messages are written
+    to the transport too, unless it's the stdout the game already prints them to.
+    Invalid input is asked for again in a loop, so any amount of it can't exhaust the stack.
     """
 
-    def __init__(self, name):
+    def __init__(self, name, transport=None):
         self.name = name
+        self.transport = transport or transports.StdioTransport()
+        self.renderer = None  # render.TerminalRenderer, once the boards are printed to an ansi transport
+
+    def _tell(self, message):
+        self.transport.write(message + "\n")
+
+    def tell(self, message):
+        if not (self.verbose and self.transport.shares_stdout):
+            self._tell(message)
 
     def _get_ship_direction(self):
         """
-        helper function to get ship direction from terminal input
-        """
-        direction_string = input("Please select the ship direction of your choice (up, down, left, right).\n")
-        if direction_string == "down":
-            return b_types.Coordinate(1, 0)
-        elif direction_string == "up":
-            return b_types.Coordinate(-1, 0)
-        elif direction_string == "right":
-            return b_types.Coordinate(0, 1)
-        elif direction_string == "left":
-            return b_types.Coordinate(0, -1)
-        else:
-            print("Invalid direction! Please try again (make sure casing and spelling match)")
-            return self._get_ship_direction()
-        return None  # will never reach return, but removes lint error
-        
+        helper function to get ship direction from the transport's input
+        """
+        while True:
+            direction_string = self.transport.read_line(
+                "Please select the ship direction of your choice (up, down, left, right).\n")
+            direction = parse_direction(direction_string)
+            if direction is not None:
+                return direction
+            self._tell("Invalid direction! Please try again (make sure casing and spelling match)")
+
     def _get_coordinate(self):
         """
-        helper function to get coordinate from terminal input
+        helper function to get coordinate from the transport's input
         """
-        error_msg = "Invalid Location! Try again."
-        coordinate_string = input("Please select the coordinate of your choice in the format of <Letter><Number> (ie. A6).\n")
-        if len(coordinate_string) < 2:
-            print(error_msg)
-            return self._get_coordinate()
-
-        # first character will be converted from uppercase letter to number from 0 to 25, where the number if the letter of the alphabet
-        # we don't need to worry about inbounds here since it's handled by set_ship on the board
-        char = coordinate_string[0]
-        row = ord(char.lower()) - 97  
-
-        try:
-            col = int(coordinate_string[1:]) - 1
-            return b_types.Coordinate(row, col)
-        except ValueError:
-            print(error_msg)
-            return self._get_coordinate()
-        
+        while True:
+            coordinate = parse_coordinate(self.transport.read_line(
+                "Please select the coordinate of your choice in the format of <Letter><Number> (ie. A6).\n"))
+            if coordinate is not None:
+                return coordinate
+            self._tell("Invalid Location! Try again.")
 
     def _choose_ship(self, ship_type, board):
         """
-        helper function to recursively choose ship incase of invalid input
+        helper function to choose ship, asking again in case of invalid input
         """
-        coordinate = self._get_coordinate()
-        direction = self._get_ship_direction()
-        
-        try:
-            board.set_ship(coordinate, direction, ship_type, self.name)
-        except b_types.BattleshipError:
-            print("Invalid Coordinate! Make sure the entire ship is in bounds and it doesn't overlap with another ship.")
-            self._choose_ship(ship_type, board)
+        while True:
+            coordinate = self._get_coordinate()
+            direction = self._get_ship_direction()
+            status = board.validate_ship(coordinate, direction, ship_type, self.name)
+            if status is b_types.MoveStatus.OK:
+                board.set_ship(coordinate, direction, ship_type, self.name)
+                return
+            self._tell("Invalid Coordinate! %s. Make sure the entire ship is in bounds and it doesn't overlap with "
+                "another ship." % status.value)
 
     def choose_ship(self, ship_type, board):
         self.print_boards(board)
-        ship_size = b_types.get_ship_sizes().get(ship_type)
-        print("%s, please choose where to set your ship!"% self.name)
-        print("The ship you are setting is %s, with size %s."% (ship_type.name, ship_size))
+        ship_size = board.get_ship_size(ship_type)
+        self._tell("%s, please choose where to set your ship!"% self.name)
+        self._tell("The ship you are setting is %s, with size %s."% (ship_type.name, ship_size))
         self._choose_ship(ship_type, board)
 
     def _choose_attack(self, board):
         """
-        helper function to recursively choose attack incase of invalid input
+        helper function to choose attack, asking again in case of invalid input
         """
-        coordinate = self._get_coordinate()
-        try:
-            return board.set_attack(coordinate, self.name)
-        except b_types.BattleshipError:
-            print("Invalid Coordinate! Make sure the attack is in bounds and there isn't another attack at that location")
-            return self._choose_attack(board)
+        while True:
+            coordinate = self._get_coordinate()
+            status = board.validate_attack(coordinate, self.name)
+            if status is b_types.MoveStatus.OK:
+                attack_result = board.set_attack(coordinate, self.name)
+                self.last_attack = coordinate
+                return attack_result
+            self._tell("Invalid Coordinate! %s. Make sure the attack is in bounds and there isn't another attack at "
+                "that location" % status.value)
 
     def choose_attack(self, board):
         self.print_boards(board)
-        print("The board is denoted by the following:")
-        print("H = Hit Attack/Ship")
-        print("M = Miss Attack")
+        legend = ["The board is denoted by the following:", "H = Hit Attack/Ship", "M = Miss Attack"]
         for ship_type, symbol in b_types.get_ship_symbols().items():
-            print("%s = %s ship"% (symbol, ship_type.name))
-        print("%s, please choose where to attack!"% self.name)
+            legend.append("%s = %s ship"% (symbol, ship_type.name))
+        legend.append("%s, please choose where to attack!"% self.name)
+        self._tell("\n".join(legend))
         return self._choose_attack(board)
 
-    def _print_board(self, matrix):
-        columns = [str(i) for i in range(1, len(matrix) + 1)]
-        print("   %s"% columns)  # spaces to offset the row letter
-        for i in range(len(matrix)):
-            print("%s: %s"% (
-                chr(i+97).upper(), # convert the row number to letter
-                matrix[i]))
-
-    def print_boards(self, board):  
+    def print_boards(self, board):
         """
-        prints the board for human player to view. Adds the column and letters around the matrix
+        prints the board for human player to view, with a single write. Adds the column and letters around the matrix
+        On an ansi transport the boards stay at the top of the screen, and only the cells that changed are redrawn.
         """
-        
-        attacks_matrix, ships_matrix = board.get_matrixes(self.name)
-        print("Attacks:")
-        self._print_board(attacks_matrix)
+        if not self.transport.ansi:
+            self.transport.write(render.render_frame(board, self.name))
+            return
+        if self.renderer is None:
+            self.renderer = render.TerminalRenderer(board, self.name, self.transport)
+        self.renderer.draw()
 
-        print("Ocean:")
-        self._print_board(ships_matrix)
-        
\ No newline at end of file
+    def game_over(self, loser):
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
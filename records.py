@@ -0,0 +1,243 @@
+"""
+Binary game records. An archive is a file of games one after the other, each game is:
+header -> GAME_HEADER, then a SHIP_ENTRY per ship in the fleet, then each player name (as a NAME_LENGTH then utf-8)
+records -> record_count fixed width RECORDs, one per placement (from set_ship) or shot (from set_attack), in order.
+An archive written by ArchiveWriter also has a sidecar index file (path + INDEX_SUFFIX) of the offset of every game.
+"""
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+import battleship_types as b_types
+import board as b_board
+import events
+
+MAGIC = b"BSG1"
+GAME_HEADER = struct.Struct("<4sIIQII")  # magic, header size, record count, seed, board size, ship count
+SHIP_ENTRY = struct.Struct("<BHH")  # ship type, index of a FleetShip (NO_INDEX for a ShipType), size
+NAME_LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<BBbbBBHII")  # kind, player, direction row, direction col, result, padding, ship, row, col
+INDEX_ENTRY = struct.Struct("<Q")
+INDEX_SUFFIX = ".idx"
+
+NO_INDEX = 0xFFFF
+NO_SHIP = 0xFFFF
+PLACEMENT = 0
+SHOT = 1
+MISS = 0
+HIT = 1
+SUNK = 2
+
+SHIP_TYPES = list(b_types.ShipType)
+
+Placement = namedtuple('Placement', ['player_name', 'starting_coordinate', 'direction', 'ship_type'])
+Shot = namedtuple('Shot', ['player_name', 'coordinate', 'attack_result'])
+
+
+def _encode_ship(ship):
+    if isinstance(ship, b_types.FleetShip):
+        return SHIP_TYPES.index(ship.ship_type), ship.index
+    return SHIP_TYPES.index(ship), NO_INDEX
+
+
+def _decode_ship(ship_type_index, fleet_index):
+    ship_type = SHIP_TYPES[ship_type_index]
+    if fleet_index == NO_INDEX:
+        return ship_type
+    return b_types.FleetShip(ship_type, fleet_index)
+
+
+class GameRecorder(events.GameHook):
+    """
+    Records a single game. It is a game hook (see events.py), so passing it to game.Game records every placement
+    and attack as it happens, and to_bytes() returns the finished game record.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.board = None
+        self.player_indexes = None
+        self.ship_indexes = None
+        self.records = bytearray()
+        self.record_count = 0
+
+    def on_game_start(self, game):
+        self.board = game.board
+        self.player_indexes = {player.name: index for index, player in enumerate(game.players)}
+        self.ship_indexes = {ship: index for index, ship in enumerate(self.board.get_fleet())}
+
+    def on_ship_placed(self, game, player, ship_type, starting_coordinate, direction, set_ship_seconds):
+        self.record_placement(starting_coordinate, direction, ship_type, player.name)
+
+    def on_attack_resolved(self, game, player, coordinate, attack_result, timing):
+        self.record_shot(coordinate, player.name, attack_result)
+
+    def _add_record(self, kind, player_name, direction, result, ship, coordinate):
+        self.records += RECORD.pack(
+            kind, self.player_indexes[player_name], direction.row, direction.col, result, 0,
+            NO_SHIP if ship is None else self.ship_indexes[ship], coordinate.row, coordinate.col)
+        self.record_count += 1
+
+    def record_placement(self, starting_coordinate, direction, ship_type, player_name):
+        self._add_record(PLACEMENT, player_name, direction, MISS, ship_type, starting_coordinate)
+
+    def record_shot(self, coordinate, player_name, attack_result):
+        if attack_result.sunk_ship_type:
+            result = SUNK
+        elif attack_result.ship_hit:
+            result = HIT
+        else:
+            result = MISS
+        self._add_record(SHOT, player_name, b_types.Coordinate(0, 0), result, attack_result.sunk_ship_type, coordinate)
+
+    def to_bytes(self):
+        fleet = self.board.get_fleet()
+        header = bytearray()
+        for ship, ship_size in fleet.items():
+            header += SHIP_ENTRY.pack(*(_encode_ship(ship) + (ship_size,)))
+        for player_name in self.player_indexes:
+            encoded_name = player_name.encode()
+            header += NAME_LENGTH.pack(len(encoded_name)) + encoded_name
+        return GAME_HEADER.pack(
+            MAGIC, GAME_HEADER.size + len(header), self.record_count, self.seed,
+            self.board.get_board_size(), len(fleet)) + bytes(header) + bytes(self.records)
+
+
+class GameRecord(object):
+    """
+    A single recorded game, read from a buffer (bytes, or a memory map of an archive) starting at offset.
+    Records are only decoded when iterated.
+    """
+
+    def __init__(self, buffer, offset=0):
+        magic, header_size, self.record_count, self.seed, self.board_size, ship_count = \
+            GAME_HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC:
+            raise b_types.BattleshipError("Invalid game record")
+        position = offset + GAME_HEADER.size
+        self.fleet = {}
+        for _ in range(ship_count):
+            ship_type_index, fleet_index, ship_size = SHIP_ENTRY.unpack_from(buffer, position)
+            self.fleet[_decode_ship(ship_type_index, fleet_index)] = ship_size
+            position += SHIP_ENTRY.size
+        self.player_names = []
+        for _ in range(2):
+            name_length, = NAME_LENGTH.unpack_from(buffer, position)
+            position += NAME_LENGTH.size
+            self.player_names.append(bytes(buffer[position:position + name_length]).decode())
+            position += name_length
+        self.buffer = buffer
+        self.records_offset = offset + header_size
+        self.size = header_size + self.record_count * RECORD.size
+
+    def iter_events(self):
+        """
+        yields a Placement or Shot for every record, in the order they happened.
+        """
+        ships = list(self.fleet)
+        for kind, player, direction_row, direction_col, result, _, ship, row, col in RECORD.iter_unpack(
+                self.buffer[self.records_offset:self.records_offset + self.record_count * RECORD.size]):
+            player_name = self.player_names[player]
+            coordinate = b_types.Coordinate(row, col)
+            if kind == PLACEMENT:
+                yield Placement(player_name, coordinate, b_types.Coordinate(direction_row, direction_col), ships[ship])
+            else:
+                yield Shot(player_name, coordinate, b_types.AttackResult(
+                    result != MISS, ships[ship] if result == SUNK else None))
+
+    def replay(self, turn=None, board_class=b_board.Board):
+        """
+        rebuilds the board after every placement and the first turn shots (every shot if turn is None).
+        Each player's shots are set with a single set_attacks call, which gives the same board as setting them
+        in turn order, since a player's attacks only change their attacks and their opponent's ships.
+        """
+        board = board_class(self.player_names, self.board_size, self.fleet)
+        shots = {player_name: [] for player_name in self.player_names}
+        shot_count = 0
+        for event in self.iter_events():
+            if isinstance(event, Placement):
+                board.set_ship(event.starting_coordinate, event.direction, event.ship_type, event.player_name)
+            elif turn is None or shot_count < turn:
+                shots[event.player_name].append(event.coordinate)
+                shot_count += 1
+            else:
+                break
+        for player_name, coordinates in shots.items():
+            board.set_attacks(player_name, coordinates)
+        return board
+
+
+class ArchiveWriter(object):
+    """
+    Appends game records (from GameRecorder.to_bytes) to an archive, and the offset of each game to its index.
+    """
+
+    def __init__(self, path):
+        self.archive_file = open(path, "ab")
+        self.index_file = open(path + INDEX_SUFFIX, "ab")
+
+    def write(self, game_bytes):
+        self.index_file.write(INDEX_ENTRY.pack(self.archive_file.tell()))
+        self.archive_file.write(game_bytes)
+
+    def close(self):
+        self.archive_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameArchive(object):
+    """
+    Reads an archive by memory mapping it, so only the games that are read are loaded.
+    Games can be looked up by index. The offsets come from the sidecar index if it matches the archive,
+    otherwise they are found by jumping from header to header.
+    """
+
+    def __init__(self, path):
+        self.archive_file = open(path, "rb")
+        if os.fstat(self.archive_file.fileno()).st_size == 0:
+            self.buffer = b""
+        else:
+            self.buffer = mmap.mmap(self.archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = self._load_offsets(path + INDEX_SUFFIX)
+
+    def _load_offsets(self, index_path):
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as index_file:
+                offsets = [offset for offset, in INDEX_ENTRY.iter_unpack(index_file.read())]
+            if not offsets or offsets[-1] + GameRecord(self.buffer, offsets[-1]).size == len(self.buffer):
+                return offsets
+        offsets = []
+        offset = 0
+        while offset < len(self.buffer):
+            offsets.append(offset)
+            _, header_size, record_count, _, _, _ = GAME_HEADER.unpack_from(self.buffer, offset)
+            offset += header_size + record_count * RECORD.size
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, game_index):
+        return GameRecord(self.buffer, self.offsets[game_index])
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield GameRecord(self.buffer, offset)
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.archive_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
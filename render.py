@@ -0,0 +1,90 @@
+import sys
+
+import board as b_board
+
+CELL_WIDTH = 5  # each cell is rendered like an item of a printed list, ie. "'H', "
+ROW_PREFIX_WIDTH = 4  # the row letter, then ": ["
+
+
+def _format_header(board_size):
+    columns = [str(i) for i in range(1, board_size + 1)]
+    return "   %s"% columns  # spaces to offset the row letter
+
+
+def _format_row(row_index, row):
+    return "%s: %s"% (
+        chr(row_index + 97).upper(),  # convert the row number to letter
+        row)
+
+
+def render_frame(board, player_name):
+    """
+    renders both of the player's boards (attacks, then ocean) into a single string,
+    with the column numbers and row letters around each matrix.
+    """
+    board_size = board.get_board_size()
+    lines = []
+    for title, matrix in zip(("Attacks:", "Ocean:"), board.get_matrixes(player_name)):
+        lines.append(title)
+        lines.append(_format_header(board_size))
+        for row_index, row in enumerate(matrix):
+            lines.append(_format_row(row_index, row))
+    lines.append("")
+    return "\n".join(lines)
+
+
+class TerminalRenderer(object):
+    """
+    Renders a player's boards at the top of an ANSI terminal, while prompts and messages scroll below them.
+    The first draw clears the screen, writes the whole frame and limits scrolling to the lines below it
+    (a scroll region), after that only the cells that changed (from board.pop_changes) are written.
+    The cursor is saved before moving to each of them and restored after, so the text being written below the frame
+    carries on where it was. Every draw is a single write to the stream, close() gives the whole screen back.
+    """
+
+    def __init__(self, board, player_name, stream=None):
+        self.board = board
+        self.player_name = player_name
+        self.stream = stream or sys.stdout
+        self.drawn = False
+        board.track_changes(player_name)
+
+    def _get_cell_position(self, plane, coordinate):
+        """
+        returns the 1 based terminal line and column of the symbol of a cell in the frame from render_frame.
+        """
+        first_row_line = 3  # after the title and column header
+        if plane == b_board.OCEAN_PLANE:
+            first_row_line += self.board.get_board_size() + 2
+        return first_row_line + coordinate.row, ROW_PREFIX_WIDTH + CELL_WIDTH * coordinate.col + 2
+
+    def _get_end_line(self):
+        return 2 * (self.board.get_board_size() + 2) + 1
+
+    def draw(self):
+        """
+        draws the whole frame the first time, then only the changed cells.
+        """
+        changes = self.board.pop_changes(self.player_name)
+        if not self.drawn:
+            self.drawn = True
+            # setting the scroll region moves the cursor to the top, so move it back below the frame
+            output = "\x1b[H\x1b[2J%s\x1b[%s;r\x1b[%s;1H"% (
+                render_frame(self.board, self.player_name), self._get_end_line(), self._get_end_line())
+        elif changes:
+            output = "\x1b7%s\x1b8"% "".join(
+                "\x1b[%s;%sH%s"% (self._get_cell_position(plane, coordinate) + (symbol,))
+                for plane, coordinate, symbol in changes
+            )
+        else:
+            return
+        self.stream.write(output)
+        self.stream.flush()
+
+    def close(self):
+        """
+        resets the scroll region, so the whole screen scrolls again.
+        """
+        if self.drawn:
+            self.stream.write("\x1b[r\x1b[999;1H\n")
+            self.stream.flush()
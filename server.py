@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import time
+from collections import deque
+
+import battleship_types as b_types
+import game
+import players
+import transports
+
+LATENCY_SAMPLE_SIZE = 1000  # latencies kept per session for percentiles
+LISTEN_BACKLOG = 4096  # so thousands of clients can connect at once
+HUMAN_SESSION_THREADS = 256  # human sessions that can play at once, the rest wait for a thread
+HUMAN_READ_TIMEOUT = 300  # seconds a human session waits for a line before closing
+
+
+class LatencyStats(object):
+    """
+    latency of every command handled for a session, in seconds.
+    only the last LATENCY_SAMPLE_SIZE latencies are kept for percentiles, so a flood of commands can't grow memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    def add(self, latency):
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.samples.append(latency)
+
+    def percentile(self, percentile):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return "count=%s mean_ms=%.3f p50_ms=%.3f p99_ms=%.3f max_ms=%.3f" % (
+            self.count, mean * 1000, self.percentile(50) * 1000, self.percentile(99) * 1000, self.max * 1000)
+
+
+class RemotePlayer(players.Player):
+    """
+    Player for a client connected to the server. The session sets the pending placement or attack
+    from the client's command before the game asks this player to choose it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pending_ship = None  # (starting coordinate, direction), or None to place the ship randomly
+        self.pending_attack = None
+        self.auto_placer = players.AIPlayer(name)
+
+    def choose_ship(self, ship_type, board):
+        if self.pending_ship is None:
+            return self.auto_placer.choose_ship(ship_type, board)
+        starting_coordinate, direction = self.pending_ship
+        board.set_ship(starting_coordinate, direction, ship_type, self.name)
+
+    def choose_attack(self, board):
+        attack_result = board.set_attack(self.pending_attack, self.name)
+        self.last_attack = self.pending_attack
+        return attack_result
+
+
+def _format_attack_result(attack_result):
+    if attack_result.sunk_ship_type:
+        return "SUNK %s" % attack_result.sunk_ship_type.name
+    elif attack_result.ship_hit:
+        return "HIT"
+    return "MISS"
+
+
+class GameSession(object):
+    """
+    A single game between a connected client and the AI, using a line based protocol.
+    The client sends the same coordinate format as HumanPlayer (ie. A6):
+    placing ships -> "<coordinate> <direction>" (ie. "A6 down") for each ship in order, or "AUTO" to place the rest randomly
+    attacking -> "<coordinate>", or several coordinates separated by spaces to queue attacks for the next turns
+    "STATS" at any time returns the latency stats of the session, "QUIT" ends the session.
+    Every command gets a reply of "OK", "ERROR <message>" or the result of the attack, followed by any AI attacks.
+    """
+
+    def __init__(self, session_id, reader, writer):
+        self.session_id = session_id
+        self.reader = reader
+        self.writer = writer
+        self.remote_player = RemotePlayer("Client")
+        self.game = game.Game(players_list=[self.remote_player, players.AIPlayer()], verbose=False)
+        self.ai_player = self.game.players[1]
+        self.ships_to_place = list(self.game.board.get_fleet().items())
+        self.latency = LatencyStats()
+        self.finished = False
+
+    def _write(self, line):
+        self.writer.write((line + "\n").encode())
+
+    def _prompt(self):
+        if self.ships_to_place:
+            ship_type, ship_size = self.ships_to_place[0]
+            self._write("PLACE %s %s" % (ship_type.name, ship_size))
+        elif not self.finished:
+            self._write("YOUR TURN")
+
+    def _place_ship(self, command):
+        ship_type, _ = self.ships_to_place[0]
+        if command.upper() == "AUTO":
+            self.remote_player.pending_ship = None
+        else:
+            parts = command.split()
+            coordinate = players.parse_coordinate(parts[0]) if len(parts) == 2 else None
+            direction = players.parse_direction(parts[1]) if len(parts) == 2 else None
+            if coordinate is None or direction is None:
+                return self._write("ERROR expected <coordinate> <direction>, ie. A6 down")
+            status = self.game.board.validate_ship(coordinate, direction, ship_type, self.remote_player.name)
+            if status is not b_types.MoveStatus.OK:
+                return self._write("ERROR %s" % status.value)
+            self.remote_player.pending_ship = (coordinate, direction)
+        self.remote_player.choose_ship(ship_type, self.game.board)
+        self.ai_player.choose_ship(ship_type, self.game.board)
+        self.ships_to_place.pop(0)
+        if self.remote_player.pending_ship is None:  # AUTO places every remaining ship
+            while self.ships_to_place:
+                ship_type, _ = self.ships_to_place.pop(0)
+                self.remote_player.choose_ship(ship_type, self.game.board)
+                self.ai_player.choose_ship(ship_type, self.game.board)
+        self._write("OK")
+        if not self.ships_to_place:
+            self._play_ai_turns()
+
+    def _play_ai_turns(self):
+        while not self._check_game_over() and self.game.players[self.game.player_turn_index] is self.ai_player:
+            attack_result = self.game.play_turn()
+            self._write("AI ATTACKS %s %s" % (
+                players.format_coordinate(self.ai_player.last_attack), _format_attack_result(attack_result)))
+
+    def _check_game_over(self):
+        loser = self.game.board.get_loser()
+        if loser and not self.finished:
+            self.finished = True
+            self._write("GAME OVER %s" % ("LOSE" if loser == self.remote_player.name else "WIN"))
+        return self.finished
+
+    def _attack(self, command):
+        """
+        attacks every coordinate in the command in order, each followed by the AI's turn,
+        stopping at the first invalid coordinate or once the game is over.
+        """
+        for coordinate_string in command.split() or [command]:
+            if self.finished:
+                return
+            coordinate = players.parse_coordinate(coordinate_string)
+            if coordinate is None:
+                return self._write("ERROR expected <coordinate>, ie. A6")
+            status = self.game.board.validate_attack(coordinate, self.remote_player.name)
+            if status is not b_types.MoveStatus.OK:
+                return self._write("ERROR %s" % status.value)
+            self.remote_player.pending_attack = coordinate
+            self._write(_format_attack_result(self.game.play_turn()))
+            self._play_ai_turns()
+
+    def handle_command(self, command):
+        """
+        handles a single command from the client, returns False once the session should close.
+        """
+        if command.upper() == "QUIT":
+            return False
+        elif command.upper() == "STATS":
+            self._write("STATS %s" % self.latency.summary())
+        elif self.finished:
+            self._write("ERROR the game is over")
+        elif self.ships_to_place:
+            self._place_ship(command)
+        else:
+            self._attack(command)
+        self._prompt()
+        return True
+
+    async def run(self):
+        self._write("WELCOME %s" % self.session_id)
+        self._prompt()
+        await self.writer.drain()
+        while True:
+            try:
+                line = await self.reader.readline()
+            except ValueError:  # the line is longer than the reader's limit, so the rest of it can't be told apart
+                self._write("ERROR line too long")
+                await self.writer.drain()
+                break
+            if not line:
+                break
+            start_time = time.perf_counter()
+            keep_open = self.handle_command(line.decode(errors="replace").strip())
+            await self.writer.drain()
+            self.latency.add(time.perf_counter() - start_time)
+            if not keep_open:
+                break
+
+
+class HumanSession(object):
+    """
+    A game where the client is seated as a players.HumanPlayer, so it gets the same prompts and boards as the
+    terminal game, and sends one answer per line. The game loop runs in a thread of executor, and the player's
+    transports.AsyncStreamTransport hands each read and write to the event loop.
+    Ends with "GAME OVER WIN" or "GAME OVER LOSE", or when the client disconnects.
+    """
+
+    def __init__(self, session_id, reader, writer, executor, ansi=False):
+        self.session_id = session_id
+        self.writer = writer
+        self.executor = executor
+        self.latency = LatencyStats()
+        self.transport = transports.AsyncStreamTransport(
+            reader, writer, asyncio.get_running_loop(), HUMAN_READ_TIMEOUT, self.latency, ansi)
+        self.human_player = players.HumanPlayer("Client", self.transport)
+        self.game = game.Game(players_list=[self.human_player, players.AIPlayer()], verbose=False)
+
+    async def run(self):
+        self.writer.write(("WELCOME %s\n" % self.session_id).encode())
+        try:
+            loser = await asyncio.get_running_loop().run_in_executor(self.executor, self.game.start_game)
+        except EOFError:
+            return
+        self.writer.write(("GAME OVER %s\n" % ("LOSE" if loser == self.human_player.name else "WIN")).encode())
+        await self.writer.drain()
+
+
+class GameServer(object):
+    """
+    hosts concurrent game sessions in a single asyncio event loop, over tcp or a unix socket.
+    Sessions use the line protocol of GameSession, or with human=True the prompts of HumanSession,
+    where ansi=True only redraws the cells of the boards that changed, for clients in an ANSI terminal.
+    latency stats of every session are merged into latency when the session closes.
+    """
+
+    def __init__(self, verbose=True, human=False, ansi=False):
+        self.verbose = verbose
+        self.human = human
+        self.ansi = ansi
+        self.executor = concurrent.futures.ThreadPoolExecutor(HUMAN_SESSION_THREADS) if human else None
+        self.session_ids = itertools.count(1)
+        self.active_sessions = {}
+        self.latency = LatencyStats()
+        self.completed_sessions = 0
+
+    async def handle_client(self, reader, writer):
+        if self.human:
+            session = HumanSession(next(self.session_ids), reader, writer, self.executor, self.ansi)
+        else:
+            session = GameSession(next(self.session_ids), reader, writer)
+        self.active_sessions[session.session_id] = session
+        try:
+            await session.run()
+        except ConnectionError:
+            pass
+        finally:
+            del self.active_sessions[session.session_id]
+            self.completed_sessions += 1
+            for latency in session.latency.samples:
+                self.latency.add(latency)
+            if self.verbose:
+                print("session %s closed: %s" % (session.session_id, session.latency.summary()))
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_client, path=unix_path, backlog=LISTEN_BACKLOG)
+        return await asyncio.start_server(self.handle_client, host, port, backlog=LISTEN_BACKLOG)
+
+
+async def serve(host, port, unix_path, verbose, human=False, ansi=False):
+    server = await GameServer(verbose, human, ansi).start(host, port, unix_path)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hosts battleship games against the AI over a line based protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="path of a unix socket to listen on instead of tcp")
+    parser.add_argument("--quiet", action="store_true", help="don't print the latency of every session")
+    parser.add_argument("--human", action="store_true", help="seat clients as a HumanPlayer, see HumanSession")
+    parser.add_argument("--ansi", action="store_true",
+        help="with --human, keep the boards at the top of the client's ANSI terminal and only redraw changed cells")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.unix, not args.quiet, args.human, args.ansi))
+
+
+if __name__ == "__main__":
+    main()
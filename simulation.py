@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+
+import battleship_types as b_types
+import bitboard
+import analytics
+import board
+import density
+import events
+import game
+import montecarlo
+import players
+import records
+
+DEFAULT_PLAYER_NAMES = ("Player 1", "Player 2")
+
+
+class SimulationResult(namedtuple('SimulationResult', [
+        'games', 'wins', 'turns_to_win', 'elapsed_seconds'])):
+    """
+    aggregated results of a batch of simulated games.
+    wins is a list with the number of games won by each seat, turns_to_win a sorted list with the length of every game.
+    """
+
+    def win_rate(self, seat_index=0):
+        return self.wins[seat_index] / self.games if self.games else 0.0
+
+    def mean_turns(self):
+        return sum(self.turns_to_win) / len(self.turns_to_win) if self.turns_to_win else 0.0
+
+    def percentile_turns(self, percentile):
+        """
+        nearest rank percentile of the turns to win, percentile is from 0 to 100
+        """
+        if not self.turns_to_win:
+            return 0
+        rank = max(1, -(-percentile * len(self.turns_to_win) // 100))
+        return self.turns_to_win[int(rank) - 1]
+
+    def games_per_second(self):
+        return self.games / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self):
+        return "%s games, win rate %.3f, turns to win mean %.2f p50 %s p90 %s p99 %s, %.1f games/second" % (
+            self.games, self.win_rate(), self.mean_turns(), self.percentile_turns(50),
+            self.percentile_turns(90), self.percentile_turns(99), self.games_per_second())
+
+
+def get_game_seed(seed, game_index):
+    """
+    seed for a single game, only depends on the batch seed and the index of the game,
+    so results don't depend on how games are split across processes.
+    """
+    return random.Random("%s:%s" % (seed, game_index)).getrandbits(64)
+
+
+def play_game(player_factories, game_seed, board_class=board.Board, board_size=board.DEFAULT_BOARD_SIZE, fleet=None,
+        player_names=DEFAULT_PLAYER_NAMES, recorder=None, hooks=None):
+    """
+    plays a single headless game, where player_factories are two callables that take a player name and return a Player.
+    hooks are passed to the game, see events.py.
+    returns the index of the winning seat and the number of turns the game took.
+    """
+    random.seed(game_seed)
+    players_list = [factory(name) for factory, name in zip(player_factories, player_names)]
+    headless_game = game.Game(
+        players_list=players_list, board_class=board_class, verbose=False, board_size=board_size, fleet=fleet,
+        recorder=recorder, hooks=hooks)
+    loser = headless_game.start_game()
+    winner_index = 1 if loser == player_names[0] else 0
+    return winner_index, headless_game.turn_count // 2
+
+
+def _play_games(args):
+    """
+    worker function for the process pool, plays the games for a chunk of game indexes.
+    returns the winner index, turns and game record (None unless recording) of every game,
+    the chunk's events.MetricsCollector (None unless collecting metrics)
+    and its analytics.GameStatistics (None unless collecting analytics).
+    """
+    (player_factories, seed, game_indexes, board_class, board_size, fleet, record, metrics, profile_games,
+        profile_dir, analyze) = args
+    metrics_collector = events.MetricsCollector() if metrics else None
+    statistics = analytics.GameStatistics(board_size) if analyze else None
+    game_results = []
+    for game_index in game_indexes:
+        game_seed = get_game_seed(seed, game_index)
+        recorder = records.GameRecorder(game_seed) if record else None
+        hooks = [metrics_collector] if metrics else []
+        if analyze:
+            hooks.append(analytics.AnalyticsHook(statistics))
+        if game_index in profile_games:
+            hooks.append(events.ProfilingHook(os.path.join(profile_dir, "game-%s.prof" % game_index)))
+        winner_index, turns = play_game(
+            player_factories, game_seed, board_class, board_size, fleet, recorder=recorder, hooks=hooks)
+        game_results.append((winner_index, turns, recorder.to_bytes() if record else None))
+    return game_results, metrics_collector, statistics
+
+
+def run_simulation(player_factories, games, processes=None, seed=0, board_class=board.Board,
+        board_size=board.DEFAULT_BOARD_SIZE, fleet=None, chunk_size=None, record_path=None, metrics_path=None,
+        profile_games=(), profile_dir=".", analytics_path=None):
+    """
+    plays games between two players with no input or output, spread across a pool of processes.
+    player_factories must be picklable (ie. a Player subclass or a module level function).
+    processes=1 plays every game in the current process.
+    if record_path is set, every game is appended to the archive at that path (see records.py), in the order they finish.
+    if metrics_path is set, the metrics of every game (see events.MetricsCollector) are written there at the end.
+    the games with an index in profile_games are profiled, to profile_dir/game-<index>.prof.
+    if analytics_path is set, the heatmaps and turns to sink statistics of the games (see analytics.py) are merged
+    from every process and saved there after each chunk, so a long simulation can be stopped at any time.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    chunk_size = chunk_size or max(1, min(1000, games // (processes * 4) or 1))
+    chunks = [
+        (player_factories, seed, range(start, min(start + chunk_size, games)), board_class, board_size, fleet,
+            record_path is not None, metrics_path is not None, frozenset(profile_games), profile_dir,
+            analytics_path is not None)
+        for start in range(0, games, chunk_size)
+    ]
+
+    archive_writer = records.ArchiveWriter(record_path) if record_path else None
+    start_time = time.perf_counter()
+    metrics_collector = events.MetricsCollector()
+    statistics = analytics.GameStatistics(board_size) if analytics_path else None
+    game_results = []
+    with multiprocessing.Pool(processes) if processes > 1 else contextlib.nullcontext() as pool:
+        chunk_results = pool.imap_unordered(_play_games, chunks) if pool else map(_play_games, chunks)
+        for chunk_result, chunk_metrics_collector, chunk_statistics in chunk_results:
+            if chunk_metrics_collector:
+                metrics_collector.merge(chunk_metrics_collector)
+            if chunk_statistics:
+                statistics.merge(chunk_statistics)
+                statistics.save(analytics_path)
+            for winner_index, turns, game_bytes in chunk_result:
+                game_results.append((winner_index, turns))
+                if archive_writer:
+                    archive_writer.write(game_bytes)
+    if archive_writer:
+        archive_writer.close()
+    if metrics_path:
+        metrics_collector.write(metrics_path)
+    elapsed_seconds = time.perf_counter() - start_time
+
+    wins = [0, 0]
+    for winner_index, _ in game_results:
+        wins[winner_index] += 1
+    turns_to_win = sorted(turns for _, turns in game_results)
+    return SimulationResult(games, wins, turns_to_win, elapsed_seconds)
+
+
+BOARD_CLASSES = {
+    "board": board.Board,
+    "bitboard": bitboard.BitBoard,
+}
+
+PLAYER_CLASSES = players.PLAYER_REGISTRY  # density and montecarlo register their players when imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays headless AI vs AI battleship games.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=sorted(BOARD_CLASSES), default="board")
+    parser.add_argument("--players", choices=sorted(PLAYER_CLASSES), nargs=2, default=["ai", "ai"])
+    parser.add_argument("--board-size", type=int, default=board.DEFAULT_BOARD_SIZE)
+    parser.add_argument("--ships-per-type", type=int, default=1, help="number of ships of each ship type in the fleet")
+    parser.add_argument("--record", default=None, help="path of an archive to record every game to")
+    parser.add_argument("--metrics", default=None, help="path to write Prometheus text format metrics to")
+    parser.add_argument("--profile-games", type=int, nargs="*", default=[], help="indexes of the games to profile")
+    parser.add_argument("--profile-dir", default=".", help="directory to write the profiles of the games to")
+    parser.add_argument("--analytics", default=None, help="path of an .npz file to save heatmaps and statistics to")
+    args = parser.parse_args()
+
+    player_factories = tuple(PLAYER_CLASSES[player] for player in args.players)
+    result = run_simulation(
+        player_factories, args.games,
+        processes=args.processes, seed=args.seed, board_class=BOARD_CLASSES[args.board], board_size=args.board_size,
+        fleet=b_types.make_fleet({ship_type: args.ships_per_type for ship_type in b_types.ShipType}),
+        record_path=args.record, metrics_path=args.metrics, profile_games=args.profile_games,
+        profile_dir=args.profile_dir, analytics_path=args.analytics)
+    print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
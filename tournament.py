@@ -0,0 +1,388 @@
+import argparse
+import contextlib
+import importlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+
+import battleship_types as b_types
+import board
+import players
+import simulation  # imports every player implementation in the repo, so they are registered
+
+DEFAULT_BATCH_SIZE = 20  # games played by a worker at a time, SPRT is checked after every batch
+DEFAULT_MAX_GAMES = 400  # games played by a matchup that SPRT hasn't decided
+DEFAULT_ELO_MARGIN = 20  # SPRT decides which of two players is stronger by at least this much Elo
+DEFAULT_ALPHA = 0.05
+DEFAULT_BETA = 0.05
+DEFAULT_BOOTSTRAP_SAMPLES = 200
+PRIOR_GAMES = 1  # games split evenly between every pair that played, so a player that never won has a finite Elo
+
+def elo_to_score(elo):
+    """
+    returns the expected score (probability of winning) of a player that is elo stronger than its opponent.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class Matchup(object):
+    """
+    Games between two entrants. Even games have first in the first seat and odd games second,
+    and each game's seed only depends on the tournament seed, the entrants and the game index,
+    so a matchup plays the same games however its batches are spread across workers or resumed.
+    """
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.wins = [0, 0]  # games won by first and second
+        self.completed_batches = set()
+
+    def key(self):
+        return "%s|%s" % (self.first, self.second)
+
+    def games(self):
+        return self.wins[0] + self.wins[1]
+
+    def llr(self, elo_margin):
+        """
+        log likelihood ratio of first being elo_margin stronger than second, against second being elo_margin stronger.
+        """
+        stronger_score = elo_to_score(elo_margin)
+        weaker_score = 1 - stronger_score
+        return (self.wins[0] * math.log(stronger_score / weaker_score)
+            + self.wins[1] * math.log(weaker_score / stronger_score))
+
+    def get_decision(self, elo_margin, alpha, beta):
+        """
+        returns the name of the entrant SPRT has decided is stronger, or None if the matchup isn't decided yet.
+        """
+        llr = self.llr(elo_margin)
+        if llr >= math.log((1 - beta) / alpha):
+            return self.first
+        if llr <= math.log(beta / (1 - alpha)):
+            return self.second
+        return None
+
+    def to_dict(self):
+        return {"first": self.first, "second": self.second, "wins": self.wins,
+            "completed_batches": sorted(self.completed_batches)}
+
+    @classmethod
+    def from_dict(cls, matchup_dict):
+        matchup = cls(matchup_dict["first"], matchup_dict["second"])
+        matchup.wins = list(matchup_dict["wins"])
+        matchup.completed_batches = set(matchup_dict["completed_batches"])
+        return matchup
+
+
+def _play_batch(args):
+    """
+    worker function for the process pool, plays a batch of a matchup's games.
+    returns the matchup key, the batch index and the games won by each entrant.
+    """
+    key, batch_index, factories, seed, batch_size, board_class, board_size, fleet = args
+    wins = [0, 0]
+    for game_index in range(batch_index * batch_size, (batch_index + 1) * batch_size):
+        seats = (0, 1) if game_index % 2 == 0 else (1, 0)
+        game_seed = simulation.get_game_seed(seed, "%s:%s" % (key, game_index))
+        winner_seat, _ = simulation.play_game(
+            (factories[seats[0]], factories[seats[1]]), game_seed, board_class, board_size, fleet)
+        wins[seats[winner_seat]] += 1
+    return key, batch_index, wins
+
+
+def fit_elo(entrants, matchups):
+    """
+    fits a Bradley-Terry model to the wins of every matchup (with PRIOR_GAMES split between each pair),
+    returns a dict of entrant to Elo, where the average entrant is 0.
+    """
+    wins = {entrant: 0.0 for entrant in entrants}
+    games = {entrant: {} for entrant in entrants}
+    for matchup in matchups:
+        wins[matchup.first] += matchup.wins[0] + PRIOR_GAMES / 2
+        wins[matchup.second] += matchup.wins[1] + PRIOR_GAMES / 2
+        pair_games = matchup.games() + PRIOR_GAMES
+        games[matchup.first][matchup.second] = games[matchup.first].get(matchup.second, 0) + pair_games
+        games[matchup.second][matchup.first] = games[matchup.second].get(matchup.first, 0) + pair_games
+
+    strengths = {entrant: 1.0 for entrant in entrants}
+    for _ in range(1000):  # minorization-maximization, converges for any connected set of matchups
+        new_strengths = {}
+        for entrant in entrants:
+            denominator = sum(
+                pair_games / (strengths[entrant] + strengths[opponent])
+                for opponent, pair_games in games[entrant].items())
+            new_strengths[entrant] = wins[entrant] / denominator if denominator else 1.0
+        log_mean = sum(math.log(strength) for strength in new_strengths.values()) / len(entrants)
+        new_strengths = {entrant: strength / math.exp(log_mean) for entrant, strength in new_strengths.items()}
+        converged = max(abs(new_strengths[entrant] - strengths[entrant]) for entrant in entrants) < 1e-9
+        strengths = new_strengths
+        if converged:
+            break
+    return {entrant: 400 * math.log10(strength) for entrant, strength in strengths.items()}
+
+
+def bootstrap_elo_intervals(entrants, matchups, samples=DEFAULT_BOOTSTRAP_SAMPLES, confidence=0.95, seed=0):
+    """
+    returns a dict of entrant to the (low, high) confidence interval of its Elo, found by refitting
+    the Elo of samples tournaments where each matchup's games are resampled from its results.
+    """
+    rng = random.Random(seed)
+    elos = {entrant: [] for entrant in entrants}
+    for _ in range(samples):
+        resampled_matchups = []
+        for matchup in matchups:
+            resampled_matchup = Matchup(matchup.first, matchup.second)
+            score = matchup.wins[0] / matchup.games() if matchup.games() else 0.5
+            first_wins = sum(rng.random() < score for _ in range(matchup.games()))
+            resampled_matchup.wins = [first_wins, matchup.games() - first_wins]
+            resampled_matchups.append(resampled_matchup)
+        for entrant, elo in fit_elo(entrants, resampled_matchups).items():
+            elos[entrant].append(elo)
+    intervals = {}
+    for entrant, entrant_elos in elos.items():
+        entrant_elos.sort()
+        low_index = int(len(entrant_elos) * (1 - confidence) / 2)
+        intervals[entrant] = (entrant_elos[low_index], entrant_elos[len(entrant_elos) - 1 - low_index])
+    return intervals
+
+
+class Tournament(object):
+    """
+    Plays every matchup of a round-robin, or rounds of Swiss pairings, between registered players.
+    Matchups are played in batches on a process pool, and stop early once SPRT decides which entrant is stronger
+    (or after max_games). If checkpoint_path is set, the results are saved there after every batch and
+    a tournament started again with the same path resumes where it stopped.
+    """
+
+    def __init__(self, entrants, tournament_format="round-robin", rounds=None, seed=0, max_games=DEFAULT_MAX_GAMES,
+            batch_size=DEFAULT_BATCH_SIZE, elo_margin=DEFAULT_ELO_MARGIN, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA,
+            board_class=board.Board, board_size=board.DEFAULT_BOARD_SIZE, fleet=None, checkpoint_path=None):
+        if len(set(entrants)) != len(entrants) or len(entrants) < 2:
+            raise b_types.BattleshipError("A tournament needs at least 2 different entrants")
+        for entrant in entrants:
+            if entrant not in players.PLAYER_REGISTRY:
+                raise b_types.BattleshipError("No player is registered as %s" % entrant)
+        if tournament_format not in ("round-robin", "swiss"):
+            raise b_types.BattleshipError("Invalid tournament format")
+        self.entrants = list(entrants)
+        self.tournament_format = tournament_format
+        self.rounds = rounds or math.ceil(math.log2(len(entrants)))  # enough rounds for a single winner
+        self.seed = seed
+        self.max_games = max_games
+        self.batch_size = batch_size
+        self.elo_margin = elo_margin
+        self.alpha = alpha
+        self.beta = beta
+        self.board_class = board_class
+        self.board_size = board_size
+        self.fleet = fleet
+        self.checkpoint_path = checkpoint_path
+        self.matchups = {}  # key to Matchup
+        self.pairings = []  # the matchup keys of each Swiss round that has started
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    def _get_config(self):
+        """
+        the settings a checkpoint must have been saved with to be resumed, as JSON values.
+        """
+        fleet = sorted([ship.name, ship_size] for ship, ship_size in self.fleet.items()) if self.fleet else None
+        return {"entrants": self.entrants, "format": self.tournament_format, "rounds": self.rounds, "seed": self.seed,
+            "batch_size": self.batch_size, "max_games": self.max_games, "board_size": self.board_size,
+            "board_class": "%s.%s" % (self.board_class.__module__, self.board_class.__qualname__), "fleet": fleet}
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["config"] != self._get_config():
+            raise b_types.BattleshipError("The checkpoint is for a different tournament")
+        self.matchups = {
+            matchup_dict["first"] + "|" + matchup_dict["second"]: Matchup.from_dict(matchup_dict)
+            for matchup_dict in checkpoint["matchups"]
+        }
+        self.pairings = checkpoint["pairings"]
+
+    def _save_checkpoint(self):
+        checkpoint = {"config": self._get_config(), "pairings": self.pairings,
+            "matchups": [matchup.to_dict() for matchup in self.matchups.values()]}
+        temporary_path = "%s.%s.tmp" % (self.checkpoint_path, os.getpid())
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _get_matchup(self, first, second):
+        key = "%s|%s" % (first, second)
+        if key not in self.matchups:
+            self.matchups[key] = Matchup(first, second)
+        return self.matchups[key]
+
+    def _is_finished(self, matchup):
+        return (matchup.games() >= self.max_games
+            or matchup.get_decision(self.elo_margin, self.alpha, self.beta) is not None)
+
+    def get_points(self):
+        """
+        returns a dict of entrant to points, 1 for each matchup won (by SPRT, or by winning more games) and 0.5 a tie.
+        """
+        points = {entrant: 0.0 for entrant in self.entrants}
+        for matchup in self.matchups.values():
+            if matchup.wins[0] == matchup.wins[1]:
+                points[matchup.first] += 0.5
+                points[matchup.second] += 0.5
+            else:
+                points[matchup.first if matchup.wins[0] > matchup.wins[1] else matchup.second] += 1
+        return points
+
+    def _pair_swiss_round(self):
+        """
+        pairs entrants with similar points that haven't played each other yet, the last entrant sits out
+        when there is an odd number of them.
+        """
+        points = self.get_points()
+        unpaired = sorted(self.entrants, key=lambda entrant: (-points[entrant], self.entrants.index(entrant)))
+        pairing = []
+        while len(unpaired) > 1:
+            first = unpaired.pop(0)
+            opponents = [
+                opponent for opponent in unpaired
+                if "%s|%s" % (first, opponent) not in self.matchups and "%s|%s" % (opponent, first) not in self.matchups
+            ]
+            second = opponents[0] if opponents else unpaired[0]  # replays a matchup only when there is no one else
+            unpaired.remove(second)
+            pairing.append("%s|%s" % (first, second))
+        return pairing
+
+    def _play_matchups(self, keys, pool, processes):
+        """
+        plays batches of the matchups until every one is finished, keeping the pool busy with batches
+        of the unfinished matchups that have played the fewest games.
+        """
+        matchups = [self._get_matchup(*key.split("|")) for key in keys]
+        next_batches = {matchup.key(): 0 for matchup in matchups}
+        in_flight = {matchup.key(): 0 for matchup in matchups}
+        completed = queue.Queue()
+
+        def get_scheduled_games(matchup):
+            return matchup.games() + in_flight[matchup.key()] * self.batch_size
+
+        def submit_batches():
+            while sum(in_flight.values()) < 2 * processes:
+                candidates = [
+                    matchup for matchup in matchups
+                    if not self._is_finished(matchup) and get_scheduled_games(matchup) < self.max_games
+                ]
+                if not candidates:
+                    return
+                matchup = min(candidates, key=get_scheduled_games)
+                key = matchup.key()
+                while next_batches[key] in matchup.completed_batches:
+                    next_batches[key] += 1
+                factories = (players.PLAYER_REGISTRY[matchup.first], players.PLAYER_REGISTRY[matchup.second])
+                args = (key, next_batches[key], factories, self.seed, self.batch_size, self.board_class,
+                    self.board_size, self.fleet)
+                next_batches[key] += 1
+                in_flight[key] += 1
+                if pool:
+                    pool.apply_async(_play_batch, (args,), callback=completed.put, error_callback=completed.put)
+                else:
+                    completed.put(_play_batch(args))
+
+        submit_batches()
+        while sum(in_flight.values()):
+            batch_result = completed.get()
+            if isinstance(batch_result, Exception):
+                raise batch_result
+            key, batch_index, wins = batch_result
+            in_flight[key] -= 1
+            matchup = self.matchups[key]
+            matchup.completed_batches.add(batch_index)
+            matchup.wins[0] += wins[0]
+            matchup.wins[1] += wins[1]
+            if self.checkpoint_path:
+                self._save_checkpoint()
+            submit_batches()
+
+    def run(self, processes=None):
+        """
+        plays the tournament, or the rest of it when resuming from a checkpoint.
+        """
+        processes = processes or multiprocessing.cpu_count()
+        with multiprocessing.Pool(processes) if processes > 1 else contextlib.nullcontext() as pool:
+            if self.tournament_format == "round-robin":
+                self._play_matchups(
+                    ["%s|%s" % pair for pair in itertools.combinations(self.entrants, 2)], pool, processes)
+                return
+            for round_index in range(self.rounds):
+                if round_index == len(self.pairings):
+                    self.pairings.append(self._pair_swiss_round())
+                    if self.checkpoint_path:
+                        self._save_checkpoint()
+                self._play_matchups(self.pairings[round_index], pool, processes)
+
+    def get_standings(self, bootstrap_samples=DEFAULT_BOOTSTRAP_SAMPLES):
+        """
+        returns a list of (entrant, elo, (low, high) 95% confidence interval, points, games), strongest first.
+        """
+        matchups = list(self.matchups.values())
+        elos = fit_elo(self.entrants, matchups)
+        intervals = bootstrap_elo_intervals(self.entrants, matchups, bootstrap_samples, seed=self.seed)
+        points = self.get_points()
+        games = {entrant: 0 for entrant in self.entrants}
+        for matchup in matchups:
+            games[matchup.first] += matchup.games()
+            games[matchup.second] += matchup.games()
+        standings = [
+            (entrant, elos[entrant], intervals[entrant], points[entrant], games[entrant]) for entrant in self.entrants
+        ]
+        return sorted(standings, key=lambda standing: -standing[1])
+
+    def summary(self):
+        lines = ["%-20s %8s %17s %7s %7s" % ("player", "elo", "95% interval", "points", "games")]
+        for entrant, elo, (low, high), points, games in self.get_standings():
+            lines.append("%-20s %8.1f  [%6.1f, %6.1f] %7.1f %7d" % (entrant, elo, low, high, points, games))
+        lines.append("")
+        for matchup in self.matchups.values():
+            decision = matchup.get_decision(self.elo_margin, self.alpha, self.beta)
+            lines.append("%s vs %s: %s-%s, %s" % (
+                matchup.first, matchup.second, matchup.wins[0], matchup.wins[1],
+                "%s is stronger" % decision if decision else "undecided"))
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays a tournament between registered AI players.")
+    parser.add_argument("--plugins", nargs="*", default=[], help="modules to import, that register more players")
+    parser.add_argument("--players", nargs="+", default=None, help="registered players to enter, all by default")
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("--rounds", type=int, default=None, help="rounds of a Swiss tournament")
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--elo-margin", type=float, default=DEFAULT_ELO_MARGIN)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--beta", type=float, default=DEFAULT_BETA)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=sorted(simulation.BOARD_CLASSES), default="board")
+    parser.add_argument("--board-size", type=int, default=board.DEFAULT_BOARD_SIZE)
+    parser.add_argument("--checkpoint", default=None, help="path to save results to, and resume from")
+    args = parser.parse_args()
+
+    for plugin in args.plugins:
+        importlib.import_module(plugin)
+    tournament = Tournament(
+        args.players or sorted(players.PLAYER_REGISTRY), args.format, rounds=args.rounds, seed=args.seed,
+        max_games=args.max_games, batch_size=args.batch_size, elo_margin=args.elo_margin, alpha=args.alpha,
+        beta=args.beta, board_class=simulation.BOARD_CLASSES[args.board], board_size=args.board_size,
+        checkpoint_path=args.checkpoint)
+    tournament.run(args.processes)
+    print(tournament.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Transports carry a players.HumanPlayer's input and output, so a human seat can be played from the terminal,
+driven from code or played over a connection. A transport has two methods:
+read_line(prompt) -> shows the prompt and returns the next line the human sends, without the line ending.
+    Raises EOFError once the human can't send any more lines (ie. they disconnected), like input() does.
+write(text) -> shows the text as it is, messages end with their own newline.
+A transport with ansi set is an ANSI terminal, so a human player only redraws the cells of the boards that changed
+(see render.TerminalRenderer), which it writes to the transport like a stream. shares_stdout is set for transports
+that write to the same stdout as a verbose game's messages, so the player doesn't write them twice.
+"""
+import asyncio
+import queue
+import sys
+import time
+
+
+class Transport(object):
+    """
+    Base class for transports. Must implement read_line and write.
+    """
+    ansi = False
+    shares_stdout = False
+
+    def read_line(self, prompt):
+        raise Exception("Unimplemented")
+
+    def write(self, text):
+        raise Exception("Unimplemented")
+
+    def flush(self):
+        pass  # writes aren't buffered
+
+
+class StdioTransport(Transport):
+    """
+    the terminal, through input() and stdout.
+    """
+    shares_stdout = True
+
+    def __init__(self, ansi=False):
+        self.ansi = ansi
+
+    def read_line(self, prompt):
+        return input(prompt)
+
+    def write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class QueueTransport(Transport):
+    """
+    in memory transport, for driving a human player from code (ie. scripted players, or another thread).
+    Lines for the player are sent with send_line, and every prompt and message the player writes is put on outbox.
+    After close(), reads raise EOFError once the lines already sent have been read. If lines are passed in,
+    they are sent and the transport is closed, so the player plays out the script and then stops.
+    timeout is how long a read waits for a line before raising EOFError, None waits forever.
+    """
+
+    def __init__(self, lines=None, timeout=None):
+        self.inbox = queue.Queue()
+        self.outbox = queue.Queue()
+        self.timeout = timeout
+        if lines is not None:
+            for line in lines:
+                self.send_line(line)
+            self.close()
+
+    def send_line(self, line):
+        self.inbox.put(line)
+
+    def close(self):
+        self.inbox.put(None)
+
+    def read_line(self, prompt):
+        self.outbox.put(prompt)
+        try:
+            line = self.inbox.get(timeout=self.timeout)
+        except queue.Empty:
+            raise EOFError("No input within %s seconds" % self.timeout)
+        if line is None:
+            self.inbox.put(None)  # so every read after this one is at the end too
+            raise EOFError("The transport is closed")
+        return line
+
+    def write(self, text):
+        self.outbox.put(text)
+
+
+class AsyncStreamTransport(Transport):
+    """
+    bridges a human player that runs in a worker thread to an asyncio StreamReader and StreamWriter served by loop.
+    Each read and write is scheduled on the loop with asyncio.run_coroutine_threadsafe, and only the worker thread
+    waits for it, so the event loop keeps serving other connections. Must not be used from the loop's own thread.
+    A read raises EOFError when the connection closes, after read_timeout seconds (None waits forever),
+    or when the line is longer than the reader's limit.
+    If latency is set (ie. a server.LatencyStats), the time from receiving each line to asking for the next,
+    which is the time the game took to handle the line, is added to it.
+    """
+
+    def __init__(self, reader, writer, loop, read_timeout=None, latency=None, ansi=False):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.read_timeout = read_timeout
+        self.latency = latency
+        self.ansi = ansi
+        self.last_line_time = None
+
+    async def _write(self, text):
+        self.writer.write(text.encode())
+        await self.writer.drain()
+
+    async def _read_line(self, prompt):
+        await self._write(prompt)
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.read_timeout)
+        except asyncio.TimeoutError:
+            raise EOFError("No input within %s seconds" % self.read_timeout)
+        except ValueError:
+            raise EOFError("The line is longer than the reader's limit")
+        if not line:
+            raise EOFError("The connection is closed")
+        return line.decode(errors="replace").rstrip("\r\n")
+
+    def read_line(self, prompt):
+        if self.latency is not None and self.last_line_time is not None:
+            self.latency.add(time.perf_counter() - self.last_line_time)
+        line = asyncio.run_coroutine_threadsafe(self._read_line(prompt), self.loop).result()
+        self.last_line_time = time.perf_counter()
+        return line
+
+    def write(self, text):
+        asyncio.run_coroutine_threadsafe(self._write(text), self.loop).result()
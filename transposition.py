@@ -0,0 +1,138 @@
+"""
+Zobrist hashing of what a player has observed of the opponent's board, and a transposition cache from those hashes
+to the result of an expensive decision, so a position that comes up again (ie. early in many games) is a lookup.
+A state's hash is the xor of a random 64 bit key for every attack (per cell, and whether it hit)
+and for every ship still afloat (per ship size), so it's updated in constant time after every attack.
+Keys are derived from the cell or ship by a fixed mixing function, so the same state has the same hash in every
+process and the cache can be saved to disk.
+Cached values are bytes (ie. a packed numpy array), and the cache is bounded by their total size rather than by
+the number of entries, since one value can be as large as the board.
+"""
+import pickle
+from collections import Counter, OrderedDict
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+ENTRY_OVERHEAD_BYTES = 200  # rough size of an entry's key and bookkeeping, on top of its value
+MASK_64 = (1 << 64) - 1
+SHIP_KEYS = 1 << 62  # ship keys are mixed from values above every cell, so they never share a key with a cell
+
+
+def _mix64(value):
+    """
+    splitmix64, spreads consecutive values to unrelated 64 bit keys.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+def get_attack_key(cell, ship_hit):
+    return _mix64(2 * cell + bool(ship_hit))
+
+
+def get_ship_key(ship_size, count):
+    """
+    key of the count-th (from 0) ship of ship_size still afloat.
+    """
+    return _mix64(SHIP_KEYS | (ship_size << 32) | count)
+
+
+class ObservedStateHash(object):
+    """
+    Zobrist hash of a player's attacks (by cell, row * board_size + col) and the sizes of the opponent's ships afloat.
+    Call add_attack after every attack and sink when an attack sinks a ship, the hash is in value.
+    """
+
+    def __init__(self, afloat_ship_sizes):
+        self.afloat_counts = Counter(afloat_ship_sizes)
+        self.value = 0
+        for ship_size, count in self.afloat_counts.items():
+            for i in range(count):
+                self.value ^= get_ship_key(ship_size, i)
+
+    def add_attack(self, cell, ship_hit):
+        self.value ^= get_attack_key(cell, ship_hit)
+
+    def sink(self, ship_size):
+        self.afloat_counts[ship_size] -= 1
+        self.value ^= get_ship_key(ship_size, self.afloat_counts[ship_size])
+
+
+class TranspositionCache(object):
+    """
+    Bounded cache of bytes values that evicts the least recently used entries once the size of the entries
+    (see get_entry_size) is over max_bytes.
+    Keys should start with the name of the strategy and the board size, since a hash only describes the attacks.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0  # total of get_entry_size over the entries
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        returns the value for the key, or None if it isn't cached.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    @staticmethod
+    def get_entry_size(value):
+        return len(value) + ENTRY_OVERHEAD_BYTES
+
+    def put(self, key, value):
+        old_value = self.entries.get(key)
+        if old_value is not None:
+            self.size -= self.get_entry_size(old_value)
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.size += self.get_entry_size(value)
+        while self.size > self.max_bytes and self.entries:
+            _, evicted_value = self.entries.popitem(last=False)
+            self.size -= self.get_entry_size(evicted_value)
+
+    def save(self, path):
+        """
+        pickles the entries to path, least recently used first.
+        """
+        with open(path, "wb") as cache_file:
+            pickle.dump((self.max_bytes, list(self.entries.items())), cache_file, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as cache_file:
+            max_bytes, entries = pickle.load(cache_file)
+        cache = cls(max_bytes)
+        for key, value in entries:
+            cache.put(key, value)
+        return cache
+
+
+_shared_cache = TranspositionCache()
+
+
+def get_shared_cache():
+    """
+    returns the cache shared by every game in this process.
+    """
+    return _shared_cache
+
+
+def set_shared_cache(cache):
+    """
+    replaces the cache shared by every game in this process, ie. with one loaded from disk.
+    """
+    global _shared_cache
+    _shared_cache = cache
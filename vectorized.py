@@ -0,0 +1,121 @@
+import random
+from collections import namedtuple
+
+import battleship_types as b_types
+import board
+import placements
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for vectorized games
+    np = None
+
+NO_SHIP = -1
+
+# arrays with an item per game. ship_hit and sunk_ship follow board.Board.set_attack's AttackResult, where sunk_ship is
+# the index of the ship in VectorizedGames.ships (NO_SHIP if none was sunk). valid is False for attacks that Board would
+# raise invalid_coordinate for, which don't change the game. done is True for games that were won by the attack, and
+# turns has the number of valid attacks those games took (0 for the other games), since finished games are reset.
+StepResult = namedtuple('StepResult', ['valid', 'ship_hit', 'sunk_ship', 'done', 'turns'])
+
+
+class VectorizedGames(object):
+    """
+    game_count games of attacking a hidden fleet, stored as stacked numpy arrays so a single step() call
+    resolves an attack in every game, for training attacking agents. Requires numpy.
+    ship_ids -> (game, row, col) index of the ship on each cell (in ships), or NO_SHIP
+    attack_planes -> (game, plane, row, col) booleans, plane HIT_PLANE is the hits and MISS_PLANE the misses
+    health -> (game, ship) cells of each ship that haven't been hit yet, a ship is sunk when it reaches 0
+    Attacks follow the same rules as board.Board.set_attack. A game is reset with a new fleet from
+    placements.generate_fleet as soon as every ship has been sunk.
+    """
+    HIT_PLANE = 0
+    MISS_PLANE = 1
+
+    def __init__(self, game_count, board_size=board.DEFAULT_BOARD_SIZE, fleet=None, seed=None):
+        if np is None:
+            raise b_types.BattleshipError("VectorizedGames requires numpy")
+        if board_size < 1 or board_size > board.MAX_BOARD_SIZE:
+            raise b_types.BattleshipError("Invalid board size")
+        self.game_count = game_count
+        self.board_size = board_size
+        self.fleet = dict(fleet) if fleet else b_types.get_ship_sizes()
+        self.ships = list(self.fleet)
+        self.ship_sizes = np.array([self.fleet[ship] for ship in self.ships], dtype=np.int32)
+        self.rng = random.Random(seed)
+        self.ship_ids = np.full((game_count, board_size, board_size), NO_SHIP, dtype=np.int16)
+        self.attack_planes = np.zeros((game_count, 2, board_size, board_size), dtype=np.bool_)
+        self.health = np.zeros((game_count, len(self.ships)), dtype=np.int32)
+        self.remaining = np.zeros(game_count, dtype=np.int32)  # ship cells that haven't been hit yet
+        self.turns = np.zeros(game_count, dtype=np.int32)
+        self.game_indexes = np.arange(game_count)
+        self.ship_indexes = {ship: index for index, ship in enumerate(self.ships)}
+        # flat views of the planes, so a cell is indexed by row * board_size + col
+        self.flat_ship_ids = self._flat_view(self.ship_ids)
+        self.flat_hits = self._flat_view(self.attack_planes[:, self.HIT_PLANE])
+        self.flat_misses = self._flat_view(self.attack_planes[:, self.MISS_PLANE])
+        self.reset(self.game_indexes)
+
+    def _flat_view(self, planes):
+        flat_planes = planes.view()
+        flat_planes.shape = (self.game_count, self.board_size * self.board_size)  # raises rather than copying
+        return flat_planes
+
+    def reset(self, game_indexes):
+        """
+        starts new games, with a new fleet, in place of the games at game_indexes.
+        """
+        self.ship_ids[game_indexes] = NO_SHIP
+        self.attack_planes[game_indexes] = False
+        self.health[game_indexes] = self.ship_sizes
+        self.remaining[game_indexes] = self.ship_sizes.sum()
+        self.turns[game_indexes] = 0
+        for game_index in game_indexes:
+            for ship, starting_coordinate, direction in placements.generate_fleet(
+                    self.fleet, self.board_size, self.rng):
+                ship_size = self.fleet[ship]
+                rows = starting_coordinate.row + direction.row * np.arange(ship_size)
+                cols = starting_coordinate.col + direction.col * np.arange(ship_size)
+                self.ship_ids[game_index, rows, cols] = self.ship_indexes[ship]
+
+    def observe(self):
+        """
+        returns a read only view of attack_planes, so it isn't copied, and it changes with every step.
+        Copy it to keep the observation of a step.
+        """
+        observation = self.attack_planes.view()
+        observation.flags.writeable = False
+        return observation
+
+    def step(self, actions):
+        """
+        attacks a cell (row * board_size + col) in every game, actions has an item per game.
+        returns a StepResult, then resets the games that were won.
+        """
+        actions = np.asarray(actions)
+        valid = (actions >= 0) & (actions < self.board_size * self.board_size)
+        cells = np.where(valid, actions, 0)
+        games = self.game_indexes
+        valid &= ~(self.flat_hits[games, cells] | self.flat_misses[games, cells])
+
+        ship_ids = self.flat_ship_ids[games, cells].astype(np.intp)
+        ship_hit = valid & (ship_ids != NO_SHIP)
+        missed = valid & ~ship_hit
+        self.flat_hits[games[ship_hit], cells[ship_hit]] = True
+        self.flat_misses[games[missed], cells[missed]] = True
+
+        hit_games = games[ship_hit]
+        self.health[hit_games, ship_ids[ship_hit]] -= 1
+        self.remaining[hit_games] -= 1
+        sunk_ship = np.full(self.game_count, NO_SHIP, dtype=np.intp)
+        sunk = ship_hit.copy()
+        sunk[hit_games] = self.health[hit_games, ship_ids[ship_hit]] <= 0
+        sunk_ship[sunk] = ship_ids[sunk]
+
+        self.turns += valid
+        done = self.remaining <= 0
+        turns = np.where(done, self.turns, 0)
+        finished_games = games[done]
+        if len(finished_games):
+            self.reset(finished_games)
+        return StepResult(valid, ship_hit, sunk_ship, done, turns)